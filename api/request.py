@@ -1,24 +1,112 @@
 import aiohttp
 
 
+class HttpSessionManager:
+    """插件共享的 aiohttp 会话：长连接复用、按主机限制连接数、DNS 缓存
+
+    在 MyPlugin.initialize 中 start()，terminate 中 close()；未启动时首次使用会按默认参数创建。
+    """
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self.limit = 100
+        self.limit_per_host = 10
+        self.dns_cache_ttl = 300
+        self.keepalive_timeout = 30
+
+    async def start(self, limit: int = 100, limit_per_host: int = 10, dns_cache_ttl: int = 300,
+                    keepalive_timeout: int = 30):
+        """按配置创建会话（已存在时先关闭旧会话）"""
+        await self.close()
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.get_session()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话（需在事件循环中调用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_session = HttpSessionManager()
+
+
 async def fetch_json(url: str, method: str = "GET", params: dict | None = None, headers: dict | None = None, timeout: int = 10):
     try:
-        async with aiohttp.ClientSession() as session:
-            if method.upper() == "GET":
-                async with session.get(url, params=params, headers=headers, timeout=timeout) as resp:
-                    ct = resp.headers.get("content-type", "")
-                    if "application/json" in ct:
-                        return await resp.json()
-                    else:
-                        text = await resp.text()
-                        return text
-            else:
-                async with session.post(url, json=params, headers=headers, timeout=timeout) as resp:
-                    ct = resp.headers.get("content-type", "")
-                    if "application/json" in ct:
-                        return await resp.json()
-                    else:
-                        text = await resp.text()
-                        return text
+        session = http_session.get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        if method.upper() == "GET":
+            async with session.get(url, params=params, headers=headers, timeout=client_timeout) as resp:
+                ct = resp.headers.get("content-type", "")
+                if "application/json" in ct:
+                    return await resp.json()
+                else:
+                    text = await resp.text()
+                    return text
+        else:
+            async with session.post(url, json=params, headers=headers, timeout=client_timeout) as resp:
+                ct = resp.headers.get("content-type", "")
+                if "application/json" in ct:
+                    return await resp.json()
+                else:
+                    text = await resp.text()
+                    return text
     except Exception as e:
         raise
+
+
+async def fetch_json_with_meta(url: str, method: str = "GET", params: dict | None = None, headers: dict | None = None, timeout: int = 10):
+    """与 fetch_json 相同，但同时返回状态码和响应头：(status, headers, body)
+
+    响应为 304 Not Modified 时 body 为 None，用于 ETag / If-Modified-Since 条件请求。
+    """
+    session = http_session.get_session()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    if method.upper() == "GET":
+        request = session.get(url, params=params, headers=headers, timeout=client_timeout)
+    else:
+        request = session.post(url, json=params, headers=headers, timeout=client_timeout)
+    async with request as resp:
+        # 保留大小写不敏感的头部字典
+        resp_headers = resp.headers.copy()
+        if resp.status == 304:
+            return resp.status, resp_headers, None
+        ct = resp.headers.get("content-type", "")
+        if "application/json" in ct:
+            body = await resp.json()
+        else:
+            body = await resp.text()
+        return resp.status, resp_headers, body
+
+
+def parse_batch_update_response(resp) -> set | None:
+    """解析 POST type=batch_update 的响应，返回失败的 task_id 集合（统一为字符串）
+
+    只有响应中明确包含 updated 或 failed 字段才视为支持批量接口；仅返回
+    {"success": true} 的通用响应无法说明更新是否生效，返回 None（调用方改为逐个发送）。
+    """
+    if not isinstance(resp, dict) or not ("updated" in resp or "failed" in resp):
+        return None
+    return {str(task_id) for task_id in (resp.get("failed") or [])}
+
+
+def check_update_response(status: int, body) -> None:
+    """检查单个更新请求的响应：非 2xx 状态或 {"success": false} 视为失败并抛出异常"""
+    if not 200 <= status < 300:
+        raise Exception(f"HTTP {status}")
+    if isinstance(body, dict) and body.get("success") is False:
+        raise Exception(f"任务中心返回失败: {body.get('error') or body.get('message') or body}")
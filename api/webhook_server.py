@@ -0,0 +1,75 @@
+import hmac
+from typing import Optional
+
+from aiohttp import web
+
+
+class TaskWebhookServer:
+    """接收任务中心推送任务的本地 HTTP 服务
+
+    POST {path}，请求头 Authorization 需与插件配置的 authorization 一致。
+    请求体与轮询返回的格式相同：单个任务、任务列表，或 {"data": [...]}。
+    """
+
+    def __init__(self, task_manager, authorization: str, logger,
+                 host: str = "0.0.0.0", port: int = 6190, path: str = "/niancenter/tasks",
+                 max_body_mb: int = 20):
+        self.task_manager = task_manager
+        self.authorization = authorization
+        self.logger = logger
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_body_mb = max_body_mb
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> web.AppRunner:
+        """启动服务，返回 AppRunner"""
+        app = web.Application(client_max_size=self.max_body_mb * 1024 * 1024)
+        app.router.add_post(self.path, self._handle_tasks)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f"任务推送服务已启动: http://{self.host}:{self.port}{self.path}")
+        return self._runner
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            self.logger.info("任务推送服务已停止")
+
+    def _authorized(self, request: web.Request) -> bool:
+        token = request.headers.get("Authorization", "")
+        # compare_digest 只接受 ASCII 字符串，统一编码为字节后比较（非 ASCII 的头部应返回 401 而不是异常）
+        return bool(self.authorization) and hmac.compare_digest(
+            token.encode("utf-8", "surrogateescape"), self.authorization.encode("utf-8", "surrogateescape")
+        )
+
+    async def _handle_tasks(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            self.logger.warning(f"任务推送认证失败: {request.remote}")
+            return web.json_response({"success": False, "error": "unauthorized"}, status=401)
+        try:
+            body = await request.json()
+        except Exception:
+            return web.json_response({"success": False, "error": "invalid json"}, status=400)
+
+        if isinstance(body, dict) and isinstance(body.get("data"), list):
+            tasks = body["data"]
+        elif isinstance(body, list):
+            tasks = body
+        elif isinstance(body, dict):
+            tasks = [body]
+        else:
+            return web.json_response({"success": False, "error": "invalid payload"}, status=400)
+
+        try:
+            result = await self.task_manager.ingest_pushed_tasks(tasks)
+        except Exception as e:
+            self.logger.exception(f"处理推送任务失败: {e}")
+            return web.json_response({"success": False, "error": str(e)}, status=500)
+        if self.logger.should_log_detail():
+            self.logger.debug(f"任务推送 - 接收{len(tasks)}个，新增{result['accepted']}个")
+        return web.json_response({"success": True, **result})
@@ -0,0 +1,243 @@
+"""TaskManager 吞吐量基准测试
+
+启动本地模拟任务中心（benchmarks/fake_task_center.py，独立子进程），让 TaskManager 完成
+同步 → 调度 → 发送 → 状态回传的完整流程，统计：
+    - tasks/sec：从启动到全部任务结束的平均吞吐量
+    - p50/p99 发送延迟：任务发送成功的时间（updated_at）- 任务执行时间
+    - 峰值 RSS：每个规模在单独的子进程中运行，互不影响
+
+消息发送使用记录时间的模拟 context，需在安装了 AstrBot 的环境中、于插件目录的上级目录运行：
+    python -m astrbot_plugin_niancenter.benchmarks.bench_task_manager --sizes 1000,10000,100000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from ..api.request import fetch_json, http_session
+from ..core.task_manager import TaskManager
+from ..scheduler.timestamps import to_epoch
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+
+
+class BenchLogger:
+    """与 LoggerManager 接口一致的静默日志，只统计错误数"""
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.errors = 0
+
+    def _emit(self, level: str, message: str):
+        if self.verbose:
+            print(f"[{level}] {message}", file=sys.stderr)
+
+    def log(self, message: str, level: str = "INFO"):
+        self._emit(level, message)
+
+    def debug(self, message: str):
+        pass
+
+    def info(self, message: str):
+        self._emit("INFO", message)
+
+    def warning(self, message: str):
+        self._emit("WARNING", message)
+
+    def error(self, message: str):
+        self.errors += 1
+        self._emit("ERROR", message)
+
+    def exception(self, message: str):
+        self.errors += 1
+        self._emit("ERROR", message)
+
+    def should_log_detail(self) -> bool:
+        return False
+
+
+class RecordingContext:
+    """模拟 AstrBot Context：记录每条消息的发送时间"""
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.sent_at: List[float] = []
+
+    async def send_message(self, unified_msg_origin, chain):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent_at.append(time.time())
+        return True
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _start_server(args, size: int):
+    cmd = [
+        sys.executable, "-m", f"{PACKAGE}.benchmarks.fake_task_center",
+        "--backlog", str(size),
+        "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate),
+        "--lead", str(args.lead),
+        "--spread", str(args.spread),
+        "--authorization", "bench",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        proc.kill()
+        raise RuntimeError("模拟任务中心启动失败")
+    return proc, json.loads(line)["port"]
+
+
+async def run_once(args, size: int) -> Dict[str, Any]:
+    """在当前进程中跑一个规模，返回统计结果"""
+    server, port = _start_server(args, size)
+    data_dir = tempfile.mkdtemp(prefix="niancenter-bench-")
+    url = f"http://127.0.0.1:{port}/api/tasks"
+    config = {
+        "task_center_url": url,
+        "authorization": "bench",
+        "task_poll_interval": 1,
+        "task_poll_min_interval": 1,
+        "task_poll_max_interval": 5,
+        "task_storage_backend": args.backend,
+        "task_max_concurrency": args.concurrency,
+        "task_active_message_concurrency": args.concurrency,
+        "task_sync_page_size": args.page_size,
+        "task_archive_after_days": 0,
+    }
+    logger = BenchLogger(args.verbose)
+    context = RecordingContext(args.send_latency)
+    manager = None
+    try:
+        await http_session.start(limit=100, limit_per_host=50)
+        manager = TaskManager(data_dir, config, logger, context)
+        started = time.time()
+        await manager.start_polling()
+
+        deadline = started + args.lead + args.spread + args.timeout
+        finished = 0
+        while time.time() < deadline:
+            await asyncio.sleep(0.5)
+            finished = sum(1 for task in manager.tasks if task.get("status") in ("success", "failed"))
+            if len(manager.tasks) >= size and finished >= size:
+                break
+        elapsed = time.time() - started
+
+        await manager.stop_polling()
+        remote = await fetch_json(url, params={"type": "stats"}, headers={"Authorization": "bench"})
+
+        lateness = []
+        for task in manager.tasks:
+            if task.get("status") != "success":
+                continue
+            due = task.get("execution_time_ts")
+            done = to_epoch(task.get("updated_at"))
+            if due is not None and done is not None:
+                lateness.append(max(0.0, done - due))
+        return {
+            "size": size,
+            "backend": args.backend,
+            "synced": len(manager.tasks),
+            "sent": len(context.sent_at),
+            "finished": finished,
+            "elapsed_s": round(elapsed, 2),
+            "tasks_per_sec": round(finished / elapsed, 1) if elapsed else 0.0,
+            "p50_lateness_ms": round(_percentile(lateness, 50) * 1000, 1),
+            "p99_lateness_ms": round(_percentile(lateness, 99) * 1000, 1),
+            "peak_rss_mb": _peak_rss_mb(),
+            "remote_success": remote.get("success") if isinstance(remote, dict) else None,
+            "remote_requests": remote.get("requests") if isinstance(remote, dict) else None,
+            "errors_logged": logger.errors,
+        }
+    finally:
+        if manager is not None:
+            manager.close()
+        await http_session.close()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _run_in_subprocess(args, size: int) -> Dict[str, Any]:
+    cmd = [
+        sys.executable, "-m", f"{PACKAGE}.benchmarks.bench_task_manager",
+        "--single", str(size),
+        "--backend", args.backend,
+        "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate),
+        "--send-latency", str(args.send_latency),
+        "--lead", str(args.lead),
+        "--spread", str(args.spread),
+        "--timeout", str(args.timeout),
+        "--concurrency", str(args.concurrency),
+        "--page-size", str(args.page_size),
+    ]
+    if args.verbose:
+        cmd.append("--verbose")
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _print_table(results: List[Dict[str, Any]]):
+    header = f"{'tasks':>8} {'backend':>7} {'finished':>8} {'sec':>8} {'tasks/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['size']:>8} {r['backend']:>7} {r['finished']:>8} {r['elapsed_s']:>8} {r['tasks_per_sec']:>9} "
+              f"{r['p50_lateness_ms']:>9} {r['p99_lateness_ms']:>9} {r['peak_rss_mb']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TaskManager 吞吐量基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="任务规模，逗号分隔")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟任务中心的请求延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟任务中心的请求失败率（0-1）")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="模拟发送消息的耗时（秒）")
+    parser.add_argument("--lead", type=float, default=10.0, help="任务执行时间距启动的秒数（留给同步）")
+    parser.add_argument("--spread", type=float, default=0.0, help="任务执行时间分布的秒数")
+    parser.add_argument("--timeout", type=float, default=600.0, help="任务到期后最多等待的秒数")
+    parser.add_argument("--concurrency", type=int, default=10, help="任务执行并发上限")
+    parser.add_argument("--page-size", type=int, default=100, help="同步每页任务数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--verbose", action="store_true", help="输出插件日志到 stderr")
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(run_once(args, args.single))))
+        return
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        results.append(_run_in_subprocess(args, size))
+        if not args.json:
+            print(f"完成 {size} 个任务", file=sys.stderr)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
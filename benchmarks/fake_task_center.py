@@ -0,0 +1,185 @@
+"""本地任务中心模拟服务：实现 TaskSyncManager / TaskExecutor / StatusUpdateOutbox 使用的协议
+
+    GET  ?type=get&synced=false&limit=&page=|cursor=   拉取未同步任务（返回 next_cursor / has_more）
+    GET  ?type=update&task_id=&synced=true             标记已同步
+    GET  ?type=update&task_id=&status=&result=         更新任务状态
+    POST {"type": "batch_update", "updates": [...]}    批量确认同步 / 批量更新状态
+    GET  ?type=stats                                   服务端统计（供基准测试读取）
+
+可配置请求延迟、错误率（随机断开连接）和积压任务数，用于在没有真实任务中心时测试吞吐量。
+
+单独运行：
+    python -m astrbot_plugin_niancenter.benchmarks.fake_task_center --backlog 10000 --latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+def _iso(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).isoformat() + "Z"
+
+
+class FakeTaskCenter:
+    """内存中的任务中心
+
+    Args:
+        backlog: 启动时积压的未同步任务数
+        latency: 每个请求的额外延迟（秒）
+        error_rate: 请求随机失败（断开连接）的概率，0-1
+        lead: 任务执行时间距启动的秒数
+        spread: 任务执行时间在 [lead, lead + spread] 秒内均匀分布
+        authorization: 非空时校验请求头 Authorization
+    """
+
+    def __init__(self, backlog: int = 1000, latency: float = 0.0, error_rate: float = 0.0,
+                 lead: float = 5.0, spread: float = 0.0, authorization: str = "bench",
+                 task_type: str = "active_message"):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.authorization = authorization
+        self.tasks: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self.stats = {"requests": 0, "errors_injected": 0, "synced": 0, "status_updates": 0,
+                      "success": 0, "failed": 0}
+        now = time.time()
+        for i in range(backlog):
+            self.add_task(f"bench-{i}", now + lead + (spread * i / backlog if backlog else 0), now, task_type)
+
+    def add_task(self, task_id: str, execution_ts: float, created_ts: Optional[float] = None,
+                 task_type: str = "active_message"):
+        self._positions[task_id] = len(self.tasks)
+        self.tasks.append({
+            "task_id": task_id,
+            "task_type": task_type,
+            "content": {"unified_msg_origin": "bench:FriendMessage:1", "type": "text", "context": f"benchmark {task_id}"},
+            "execution_time": _iso(execution_ts),
+            "created_at": _iso(created_ts if created_ts is not None else time.time()),
+            "status": "pending",
+            "synced": False,
+        })
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        return app
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.authorization and request.headers.get("Authorization") != self.authorization:
+            return web.json_response({"success": False, "error": "unauthorized"}, status=401)
+        params = dict(request.query)
+        if params.get("type") != "stats" and self.error_rate and random.random() < self.error_rate:
+            # 模拟网络故障：直接断开连接，客户端收到异常
+            self.stats["errors_injected"] += 1
+            if request.transport is not None:
+                request.transport.close()
+            return web.Response(status=503)
+
+        if request.method == "POST":
+            body = await request.json()
+            if body.get("type") == "batch_update":
+                for update in body.get("updates", []):
+                    self._apply_update(update)
+                return web.json_response({"success": True, "updated": len(body.get("updates", []))})
+            return web.json_response({"success": False, "error": "unknown type"}, status=400)
+
+        request_type = params.get("type")
+        if request_type == "get":
+            return web.json_response(self._get_page(params))
+        if request_type == "update":
+            update = {"task_id": params.get("task_id")}
+            if params.get("synced") is not None:
+                update["synced"] = params.get("synced") == "true"
+            if params.get("status"):
+                update["status"] = params["status"]
+            if params.get("result"):
+                update["result"] = json.loads(params["result"])
+            self._apply_update(update)
+            return web.json_response({"success": True})
+        if request_type == "stats":
+            return web.json_response(dict(self.stats, total=len(self.tasks)))
+        return web.json_response({"success": False, "error": "unknown type"}, status=400)
+
+    def _get_page(self, params: dict) -> dict:
+        limit = int(params.get("limit") or len(self.tasks) or 1)
+        only_unsynced = params.get("synced") == "false"
+        start = int(params["cursor"]) if params.get("cursor") else 0
+        data = []
+        position = start
+        while position < len(self.tasks) and len(data) < limit:
+            task = self.tasks[position]
+            if not (only_unsynced and task["synced"]):
+                data.append(task)
+            position += 1
+        # 游标是任务列表中的位置，标记已同步不会让后续任务偏移
+        has_more = position < len(self.tasks)
+        resp = {"success": True, "data": data, "has_more": has_more}
+        if has_more:
+            resp["next_cursor"] = str(position)
+        return resp
+
+    def _apply_update(self, update: dict):
+        position = self._positions.get(str(update.get("task_id")))
+        if position is None:
+            return
+        task = self.tasks[position]
+        if update.get("synced") and not task["synced"]:
+            task["synced"] = True
+            self.stats["synced"] += 1
+        status = update.get("status")
+        if status:
+            self.stats["status_updates"] += 1
+            if status in ("success", "failed") and task["status"] != status:
+                self.stats[status] += 1
+            task["status"] = status
+            task["result"] = update.get("result")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        """启动服务，port 为 0 时自动分配端口（self.port 为实际端口）"""
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        self.port = runner.addresses[0][1]
+        return runner
+
+
+async def _serve(args):
+    center = FakeTaskCenter(backlog=args.backlog, latency=args.latency, error_rate=args.error_rate,
+                            lead=args.lead, spread=args.spread, authorization=args.authorization)
+    runner = await center.start(args.host, args.port)
+    # 输出实际端口，供基准测试脚本读取
+    print(json.dumps({"port": center.port}), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地任务中心模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--backlog", type=int, default=1000, help="积压的未同步任务数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="请求随机失败的概率（0-1）")
+    parser.add_argument("--lead", type=float, default=5.0, help="任务执行时间距启动的秒数")
+    parser.add_argument("--spread", type=float, default=0.0, help="任务执行时间分布的秒数")
+    parser.add_argument("--authorization", default="bench")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
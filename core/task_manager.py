@@ -1,19 +1,29 @@
 import os
 import json
+import time
 import asyncio
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from ..storage.cache_utils import CacheUtils
+from ..storage.task_store import create_task_store
+from ..storage.task_archive import TaskArchive
+from ..storage.journal import JsonlJournal
+from ..storage.file_io import file_io
 from ..processing.message_chain_builder import MessageChainBuilder
 from ..scheduler.task_sync_manager import TaskSyncManager
 from ..scheduler.task_executor import TaskExecutor
+from ..scheduler.status_outbox import StatusUpdateOutbox
+from ..scheduler.timer_service import TimerService
+from ..scheduler.timestamps import cached_epoch, to_epoch
+from ..scheduler.circuit_breaker import CircuitBreaker, backoff_with_jitter
 
 
 class TaskManager:
     """管理主动消息任务和本地存储任务的轮询、同步和执行"""
     
-    def __init__(self, data_dir: str, config: dict, logger, context):
+    def __init__(self, data_dir: str, config: dict, logger, context, timer_service: Optional[TimerService] = None,
+                 cache_utils: Optional[CacheUtils] = None):
         self.data_dir = data_dir  # 数据目录
         self.config = config
         self.logger = logger
@@ -25,18 +35,72 @@ class TaskManager:
         
         self.tasks_file = os.path.join(self.tasks_dir, "tasks.json")
         self.tasks: List[Dict[str, Any]] = []
+        # task_id -> 任务记录，与同步管理器共享，查找和去重均为 O(1)
+        self._task_index: Dict[Any, Dict[str, Any]] = {}
+        
+        # 待执行任务按执行时间注册到共享定时器服务，到期后放入 _due 并唤醒轮询循环执行
+        # 未传入定时器服务时（如基准测试）使用自己的实例，随轮询启停
+        self.timers = timer_service or TimerService(logger)
+        self._owns_timers = timer_service is None
+        self._task_timers: Dict[Any, Any] = {}
+        self._due: List[Any] = []
+        
+        # 任务存储后端（json / sqlite）
+        self.store = create_task_store(self.tasks_dir, config.get("task_storage_backend", "json"))
+        
+        # 一个轮询周期内变化的任务先记入意图日志（fsync），周期结束时统一落盘
+        # 意图日志在文件线程池中组提交：写入进行中时到达的变化合并为下一次追加
+        self._dirty: Dict[Any, Dict[str, Any]] = {}
+        self._intent_log = JsonlJournal(os.path.join(self.tasks_dir, "intent.journal"), fsync=True)
+        self._intent_buffer: List[Dict[str, Any]] = []
+        self._intent_writer: Optional[asyncio.Task] = None
+        self._intent_truncate = False
         self._load_tasks()
         
+        # 已结束任务超过指定天数后移入按天归档文件（0 表示不归档）
+        self.archive = TaskArchive(self.tasks_dir)
+        self._archive_after_days = config.get("task_archive_after_days", 7)
+        self._archive_check_interval = 3600
+        self._last_archive_check = 0.0
+        
         # API 配置
         self.task_center_url = config.get("task_center_url", "https://hunian003-message.hf.space/plugins/astr_task_center/api/tasks")
         self.authorization = config.get("authorization", "")
         
         # 轮询状态
         self._polling = False
+        self._polling_task: Optional[asyncio.Task] = None
+        self._loop_errors = 0
         self._poll_interval = config.get("task_poll_interval", 60)
         
-        # 初始化缓存工具
-        self.cache_utils = CacheUtils(data_dir)
+        # 自适应轮询：有新任务时缩短间隔，空闲时逐步放宽；有更早到期的任务时按到期时间唤醒
+        self._min_poll_interval = max(1, config.get("task_poll_min_interval", 10))
+        self._max_poll_interval = max(self._min_poll_interval, config.get("task_poll_max_interval", 300))
+        self._current_interval = min(max(self._poll_interval, self._min_poll_interval), self._max_poll_interval)
+        self._wake_event = asyncio.Event()
+        self._wake_reason = "startup"
+        self._next_wake_at: Optional[float] = None
+        
+        # 任务中心熔断：连续同步失败后按指数退避（带抖动）暂停同步，到时试探恢复
+        self._breaker = CircuitBreaker(
+            failure_threshold=config.get("task_breaker_failure_threshold", 5),
+            base_delay=self._min_poll_interval,
+            max_delay=max(self._max_poll_interval, config.get("task_breaker_max_backoff", 600))
+        )
+        
+        # 到期任务并发执行：总并发上限 + 按任务类型的并发上限
+        self._execution_semaphore = asyncio.Semaphore(max(1, config.get("task_max_concurrency", 10)))
+        self._type_semaphores = {
+            "active_message": asyncio.Semaphore(max(1, config.get("task_active_message_concurrency", 5))),
+            "local_storage": asyncio.Semaphore(max(1, config.get("task_local_storage_concurrency", 2))),
+        }
+        # 已派发到后台的任务执行：task_id -> asyncio.Task，轮询循环不等待它们完成
+        self._running: Dict[Any, asyncio.Task] = {}
+        # 停止轮询时等待执行中任务完成的最长时间，超时后中断并恢复为待执行
+        self._shutdown_timeout = max(0.0, config.get("task_shutdown_timeout", 10))
+        
+        # 初始化缓存工具（与消息处理器共用同一个实例，共享缓存索引）
+        self.cache_utils = cache_utils or CacheUtils(data_dir)
         
         # 初始化消息构建器
         self.message_chain_builder = MessageChainBuilder(logger)
@@ -44,35 +108,181 @@ class TaskManager:
         # 初始化同步管理器
         self.sync_manager = TaskSyncManager(
             self.task_center_url, self.authorization, logger, 
-            self.tasks, self._save_tasks
+            self.tasks, self._mark_dirty, self._schedule_task, self._task_index,
+            os.path.join(self.tasks_dir, "sync_state.json"),
+            mark_concurrency=config.get("task_sync_mark_concurrency", 10),
+            bulk_mode=config.get("task_center_bulk_update", "auto"),
+            page_size=config.get("task_sync_page_size", 100),
+            archive=self.archive
+        )
+        
+        # 初始化状态更新发件箱（批量发送远程状态更新）
+        self.status_outbox = StatusUpdateOutbox(
+            self.task_center_url, self.authorization, logger,
+            batch_size=config.get("task_status_batch_size", 50),
+            flush_interval=config.get("task_status_flush_interval", 1.0),
+            bulk_mode=config.get("task_center_bulk_update", "auto"),
+            state_file=os.path.join(self.tasks_dir, "status_outbox.json"),
+            retry_max_delay=config.get("task_status_retry_max_delay", 600)
         )
         
         # 初始化执行器
         self.executor = TaskExecutor(
             logger, context, self.task_center_url, self.authorization,
-            self.cache_utils, self.message_chain_builder, self._save_tasks
+            self.cache_utils, self.message_chain_builder, self._mark_dirty,
+            self.status_outbox
         )
         
     def _load_tasks(self):
         """从本地加载任务列表"""
         try:
-            if os.path.exists(self.tasks_file):
-                with open(self.tasks_file, "r", encoding="utf-8") as f:
-                    self.tasks = json.load(f)
-            else:
-                self.tasks = []
+            self.tasks = self.store.load_all()
         except Exception as e:
             self.logger.exception(f"加载任务文件失败: {e}")
             self.tasks = []
+        self._task_index.clear()
+        for handle in self._task_timers.values():
+            handle.cancel()
+        self._task_timers.clear()
+        for task in self.tasks:
+            task_id = task.get("task_id")
+            if task_id is not None:
+                self._task_index.setdefault(task_id, task)
+        self._replay_intent_log()
+        # 上次异常退出时中断的执行中任务恢复为待执行（仍按原执行时间和执行窗口调度）
+        stale = [task for task in self.tasks if task.get("status") == "running"]
+        for task in stale:
+            task["status"] = "pending"
+            self._dirty[task.get("task_id")] = task
+        if stale:
+            self.logger.warning(f"{len(stale)}个任务上次执行未完成，恢复为待执行")
+            self._flush_tasks()
+        for task in self.tasks:
+            self._schedule_task(task)
+    
+    def _replay_intent_log(self):
+        """回放上次异常退出时未落盘的任务变化"""
+        try:
+            replayed = 0
+            for record in self._intent_log.replay():
+                task = record.get("task")
+                if not isinstance(task, dict) or task.get("task_id") is None:
+                    continue
+                task_id = task["task_id"]
+                existing = self._task_index.get(task_id)
+                if existing is not None:
+                    existing.clear()
+                    existing.update(task)
+                else:
+                    self.tasks.append(task)
+                    self._task_index[task_id] = task
+                    existing = task
+                self._dirty[task_id] = existing
+                replayed += 1
+            if replayed:
+                self.logger.warning(f"从意图日志恢复了{replayed}条未落盘的任务变化")
+                self._flush_tasks()
+        except Exception as e:
+            self.logger.exception(f"回放任务意图日志失败: {e}")
+    
+    def _mark_dirty(self, changed: List[Dict[str, Any]]):
+        """记录发生变化的任务：交给后台写入意图日志，等周期结束时统一落盘"""
+        records = []
+        for task in changed:
+            task_id = task.get("task_id")
+            if task_id is None:
+                continue
+            self._dirty[task_id] = task
+            # 复制一份，线程池序列化时不受后续修改影响
+            records.append({"task": dict(task)})
+        if not records:
+            return
+        self._intent_buffer.extend(records)
+        if self._intent_writer is None:
+            try:
+                self._intent_writer = asyncio.get_running_loop().create_task(self._write_intents())
+            except RuntimeError:
+                # 不在事件循环中（如初始化阶段）时同步写入
+                self._write_intents_sync()
+    
+    def _write_intents_sync(self):
+        records, self._intent_buffer = self._intent_buffer, []
+        try:
+            self._intent_log.append_many(records)
+        except Exception as e:
+            # 意图日志不可用时直接落盘，保证状态不丢
+            self.logger.exception(f"写入任务意图日志失败: {e}")
+            self._flush_tasks()
+    
+    async def _write_intents(self):
+        """意图日志写入循环：每次把缓冲区中的全部记录一次追加（一次 fsync）"""
+        try:
+            while self._intent_buffer or self._intent_truncate:
+                if self._intent_truncate:
+                    # 写入期间任务已落盘：先清空日志，再写入落盘之后的新变化
+                    self._intent_truncate = False
+                    try:
+                        await file_io.run(self._intent_log.truncate)
+                    except Exception as e:
+                        self.logger.exception(f"清空任务意图日志失败: {e}")
+                    continue
+                records, self._intent_buffer = self._intent_buffer, []
+                try:
+                    await file_io.run(self._intent_log.append_many, records)
+                except Exception as e:
+                    # 意图日志不可用时直接落盘，保证状态不丢
+                    self.logger.exception(f"写入任务意图日志失败: {e}")
+                    self._flush_tasks()
+        finally:
+            self._intent_writer = None
     
-    def _save_tasks(self):
-        """保存任务列表到本地"""
+    async def _drain_intents(self):
+        """等待进行中的意图日志写入完成"""
+        while self._intent_writer is not None:
+            await asyncio.shield(self._intent_writer)
+    
+    def _flush_tasks(self):
+        """把本周期内变化的任务一次性落盘，并清空意图日志"""
+        if not self._dirty:
+            return
+        changed = list(self._dirty.values())
+        self._dirty.clear()
         try:
-            os.makedirs(os.path.dirname(self.tasks_file), exist_ok=True)
-            with open(self.tasks_file, "w", encoding="utf-8") as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            self.store.save(self.tasks, changed)
+            # 尚未写入日志的变化已随本次落盘保存
+            self._intent_buffer.clear()
+            if self._intent_writer is not None:
+                # 写入进行中，由写入循环在本次追加完成后清空日志，保证顺序
+                self._intent_truncate = True
+            else:
+                self._intent_log.truncate()
         except Exception as e:
             self.logger.exception(f"保存任务文件失败: {e}")
+            for task in changed:
+                self._dirty.setdefault(task.get("task_id"), task)
+    
+    def _schedule_task(self, task: Dict[str, Any]):
+        """解析待执行任务的执行时间（只解析一次）并注册到定时器服务"""
+        if task.get("status") != "pending":
+            return
+        if task.get("execution_time"):
+            deadline = cached_epoch(task, "execution_time")
+        else:
+            deadline = to_epoch(task.get("created_at"))
+        if deadline is None:
+            self.logger.debug(f"无法解析任务执行时间: {task.get('execution_time')} ({task.get('task_id')})")
+            return
+        task_id = task.get("task_id")
+        previous = self._task_timers.pop(task_id, None)
+        if previous is not None:
+            previous.cancel()
+        self._task_timers[task_id] = self.timers.call_at(deadline, self._on_task_due, task, deadline)
+    
+    def _on_task_due(self, task: Dict[str, Any], deadline: float):
+        """定时器回调：任务到期，交给轮询循环执行"""
+        self._task_timers.pop(task.get("task_id"), None)
+        self._due.append((deadline, task))
+        self.wake("deadline")
     
     async def start_polling(self):
         """启动后台轮询任务"""
@@ -82,110 +292,294 @@ class TaskManager:
         
         self._polling = True
         self.logger.info("启动任务轮询线程")
-        asyncio.create_task(self._polling_loop())
+        if self._owns_timers:
+            self.timers.start()
+        self.status_outbox.start()
+        self._spawn_polling_loop()
+    
+    def _spawn_polling_loop(self):
+        if not self._polling:
+            return
+        self._polling_task = asyncio.create_task(self._polling_loop())
+        self._polling_task.add_done_callback(self._on_polling_loop_done)
+    
+    def _on_polling_loop_done(self, task: asyncio.Task):
+        """轮询循环意外退出时，退避后自动重启"""
+        if task.cancelled() or not self._polling:
+            return
+        error = task.exception()
+        self._loop_errors += 1
+        delay = backoff_with_jitter(self._loop_errors, self._min_poll_interval, self._max_poll_interval)
+        self.logger.error(f"轮询循环意外退出: {error}，{delay:.1f}秒后重启")
+        asyncio.get_running_loop().call_later(delay, self._spawn_polling_loop)
     
     async def stop_polling(self):
         """停止后台轮询任务"""
         self._polling = False
+        self._wake_event.set()
+        if self._polling_task is not None:
+            self._polling_task.cancel()
+            try:
+                await self._polling_task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                self.logger.exception(f"轮询循环退出时出错: {e}")
+            self._polling_task = None
+        await self._drain_running_tasks()
+        if self._owns_timers:
+            await self.timers.stop()
+        await self.status_outbox.stop()
+        self._flush_tasks()
+        await self._drain_intents()
         self.logger.info("停止任务轮询线程")
     
+    async def _drain_running_tasks(self):
+        """等待执行中的任务完成；超时后中断剩余任务，把它们恢复为待执行，下次启动时重新执行"""
+        running = dict(self._running)
+        if not running:
+            return
+        _, unfinished = await asyncio.wait(running.values(), timeout=self._shutdown_timeout)
+        if not unfinished:
+            return
+        self.logger.warning(f"停止时仍有{len(unfinished)}个任务未执行完，中断并恢复为待执行")
+        for execution in unfinished:
+            execution.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        for task_id, execution in running.items():
+            task = self._task_index.get(task_id)
+            if execution not in unfinished or task is None:
+                continue
+            if task.get("status") == "running":
+                self._requeue_task(task)
+            elif task.get("status") == "pending":
+                # 还在信号量上排队的任务重新注册定时器
+                self._schedule_task(task)
+    
+    def _requeue_task(self, task: Dict[str, Any]):
+        """把中断的执行中任务恢复为待执行（主动消息可能已部分发送，重新执行时会再次发送）"""
+        task["status"] = "pending"
+        task["updated_at"] = datetime.utcnow().isoformat() + "Z"
+        self._mark_dirty([task])
+        self.status_outbox.enqueue(task.get("task_id"), "pending")
+        self._schedule_task(task)
+    
+    def close(self):
+        """释放任务存储和意图日志（在 stop_polling 之后调用）"""
+        self._flush_tasks()
+        self._intent_log.close()
+        self.store.close()
+    
+    def wake(self, reason: str = "wake"):
+        """提前唤醒轮询循环（例如收到新任务时）"""
+        self._wake_reason = reason
+        self._wake_event.set()
+    
+    async def ingest_pushed_tasks(self, tasks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """接收推送的任务：合并入库、落盘，并立即唤醒轮询循环执行到期任务"""
+        result = await self.sync_manager.ingest_pushed_tasks(tasks)
+        self._flush_tasks()
+        if result.get("accepted"):
+            self.wake("push")
+        return result
+    
+    def _adapt_poll_interval(self, new_count: Optional[int]):
+        """根据本次同步结果调整轮询间隔"""
+        if new_count is None:
+            return
+        if new_count > 0:
+            self._current_interval = max(self._min_poll_interval, self._current_interval / 2)
+        else:
+            self._current_interval = min(self._max_poll_interval, self._current_interval * 1.5)
+    
+    async def _sleep_until_next_wake(self, next_sync_at: float):
+        """睡眠到下一次同步时间，任务到期（定时器回调）或 wake() 时提前唤醒"""
+        wake_at = next_sync_at
+        self._next_wake_at = wake_at
+        self._wake_reason = "poll"
+        
+        self._wake_event.clear()
+        # 执行期间又有任务到期时不再睡眠
+        if self._due:
+            return
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), timeout=max(0.0, wake_at - time.time()))
+        except asyncio.TimeoutError:
+            pass
+    
+    def get_polling_status(self) -> Dict[str, Any]:
+        """当前轮询状态：间隔、下次唤醒时间与原因、待执行任务数"""
+        next_wake, reason = self._next_wake_at, self._wake_reason
+        next_deadline = min((h.deadline for h in self._task_timers.values() if not h.cancelled), default=None)
+        if next_deadline is not None and (next_wake is None or next_deadline < next_wake):
+            next_wake, reason = next_deadline, "deadline"
+        if next_wake is not None:
+            next_wake = datetime.fromtimestamp(next_wake).strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            "polling": self._polling,
+            "interval": round(self._current_interval, 1),
+            "wake_reason": reason,
+            "next_wake_at": next_wake,
+            "pending_scheduled": len(self._task_timers),
+            "running_tasks": len(self._running),
+            "breaker": self._breaker.get_status(),
+        }
+    
     async def _polling_loop(self):
-        """轮询主循环"""
-        consecutive_errors = 0
-        max_consecutive_errors = 5
-        self.logger.info(f"轮询循环已启动，轮询间隔: {self._poll_interval}秒")
+        """轮询主循环：同步失败由熔断器退避，循环自身出错时退避后继续，不会永久退出"""
+        next_sync_at = 0.0
+        self.logger.info(f"轮询循环已启动，轮询间隔: {self._current_interval}秒（{self._min_poll_interval}-{self._max_poll_interval}秒自适应）")
         
         while self._polling:
             try:
-                # 轮询获取新任务
-                await self.sync_manager.sync_tasks()
+                # 到达同步时间时轮询获取新任务（因任务到期被唤醒时只执行任务）；熔断期间只执行本地任务
+                now = time.time()
+                if now >= next_sync_at and self._breaker.allow(now):
+                    next_sync_at = await self._sync_with_breaker()
                 
                 # 执行到期的任务
                 await self._execute_pending_tasks()
                 
-                # 重置错误计数
-                consecutive_errors = 0
+                # 归档已结束的旧任务
+                self._archive_finished_tasks()
+                
+                # 本周期的任务变化统一落盘
+                self._flush_tasks()
                 
-                # 等待下一个轮询周期
-                await asyncio.sleep(self._poll_interval)
+                self._loop_errors = 0
+                
+                # 等待下一次同步或任务到期
+                await self._sleep_until_next_wake(next_sync_at)
             except asyncio.CancelledError:
                 self.logger.info("轮询循环已取消")
-                break
+                raise
             except Exception as e:
-                consecutive_errors += 1
-                self.logger.exception(f"轮询循环出错 ({consecutive_errors}/{max_consecutive_errors}): {e}")
-                
-                # 如果连续错误次数过多，增加等待时间
-                wait_time = self._poll_interval * (2 ** min(consecutive_errors - 1, 3))
-                self.logger.warning(f"轮询循环等待 {wait_time}秒后重试")
-                
-                try:
-                    await asyncio.sleep(wait_time)
-                except asyncio.CancelledError:
-                    break
-                
-                # 如果连续错误次数过多，停止轮询
-                if consecutive_errors >= max_consecutive_errors:
-                    self.logger.error(f"轮询循环连续失败{max_consecutive_errors}次，停止轮询")
-                    self._polling = False
-                    break
+                self._loop_errors += 1
+                wait_time = backoff_with_jitter(self._loop_errors, self._min_poll_interval, self._max_poll_interval)
+                self.logger.exception(f"轮询循环出错（连续{self._loop_errors}次），{wait_time:.1f}秒后重试: {e}")
+                await asyncio.sleep(wait_time)
+    
+    async def _sync_with_breaker(self) -> float:
+        """同步一次并更新熔断器，返回下次同步时间"""
+        was_closed = self._breaker.state == CircuitBreaker.CLOSED
+        new_count = await self.sync_manager.sync_tasks()
+        if new_count is None and self.authorization:
+            retry_at = self._breaker.record_failure("任务同步失败")
+            status = self._breaker.get_status()
+            if self._breaker.state == CircuitBreaker.OPEN:
+                self.logger.warning(f"任务中心熔断（连续失败{status['failures']}次），下次试探: {status['next_probe_at']}")
+            return retry_at
+        if not was_closed:
+            self.logger.info("任务中心已恢复，熔断关闭")
+        self._breaker.record_success()
+        self._adapt_poll_interval(new_count)
+        return time.time() + self._current_interval
     
     async def _execute_pending_tasks(self):
-        """执行到期的待执行任务"""
+        """把到期的待执行任务派发到后台执行
+
+        任务在类型和总并发上限内各自执行，轮询循环不等待执行完成，慢任务不会阻塞后续到期任务。
+        """
         try:
-            now = datetime.utcnow()
-            executed_count = 0
+            now = time.time()
+            dispatched = 0
             
-            for task in self.tasks:
-                try:
-                    if task.get("status") != "pending":
-                        continue
-                    
-                    execution_time = task.get("execution_time") or task.get("created_at")
-                    if not execution_time:
-                        continue
-                    
-                    try:
-                        if isinstance(execution_time, str):
-                            time_str = execution_time.rstrip("Z")
-                            if "+" in time_str:
-                                time_str = time_str.split("+")[0]
-                            exec_time = datetime.fromisoformat(time_str)
-                        else:
-                            exec_time = datetime.fromtimestamp(execution_time)
-                    except Exception as parse_e:
-                        self.logger.debug(f"无法解析任务执行时间: {execution_time} - {parse_e}")
-                        continue
-                    
-                    time_diff = (now - exec_time).total_seconds()
-                    if 0 <= time_diff <= 300:
-                        task_type = task.get("type", "unknown")
-                        task_id = task.get("task_id", "unknown")
-                        
-                        try:
-                            if task_type == "active_message":
-                                await self.executor.execute_active_message(task)
-                                executed_count += 1
-                            elif task_type == "local_storage":
-                                await self.executor.execute_local_storage(task)
-                                executed_count += 1
-                            else:
-                                self.logger.warning(f"未知的任务类型: {task_type} ({task_id})")
-                        except Exception as exec_e:
-                            self.logger.exception(f"执行{task_type}类型任务失败 ({task_id}): {exec_e}")
-                except Exception as task_e:
-                    self.logger.exception(f"处理任务出错失败: {task_e}")
+            due, self._due = self._due, []
+            for deadline, task in due:
+                # 注册后状态已变化的任务直接丢弃
+                if task.get("status") != "pending":
+                    continue
+                
+                task_type = task.get("type", "unknown")
+                task_id = task.get("task_id", "unknown")
+                
+                # 已在执行（排队）中的任务不重复派发
+                if task_id in self._running:
+                    continue
+                
+                # 超过执行窗口（5分钟）的任务不再执行
+                if now - deadline > 300:
+                    self.logger.warning(f"任务已超过执行窗口，跳过: {task_id}")
+                    continue
+                
+                if task_type not in self._type_semaphores:
+                    self.logger.warning(f"未知的任务类型: {task_type} ({task_id})")
+                    continue
+                execution = asyncio.create_task(self._run_task(task))
+                self._running[task_id] = execution
+                execution.add_done_callback(lambda _, task_id=task_id: self._on_task_finished(task_id))
+                dispatched += 1
             
-            if executed_count > 0:
-                self.logger.info(f"执行了{executed_count}个任务")
+            if dispatched > 0:
+                self.logger.info(f"派发了{dispatched}个到期任务")
         except asyncio.CancelledError:
             raise
         except Exception as e:
             self.logger.exception(f"执行待执行任务失败: {e}")
     
+    def _on_task_finished(self, task_id: Any):
+        """后台任务执行结束：移出执行表，唤醒轮询循环落盘状态变化"""
+        self._running.pop(task_id, None)
+        if self._polling:
+            self.wake("executed")
+    
+    async def _run_task(self, task: Dict[str, Any]) -> bool:
+        """在并发限制内执行单个任务
+
+        先取类型信号量再取总信号量：某一类型排队时不占用总并发名额，其他类型不受影响。
+        """
+        task_type = task.get("type", "unknown")
+        task_id = task.get("task_id", "unknown")
+        try:
+            async with self._type_semaphores[task_type]:
+                async with self._execution_semaphore:
+                    if task_type == "active_message":
+                        await self.executor.execute_active_message(task)
+                    else:
+                        await self.executor.execute_local_storage(task)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as exec_e:
+            self.logger.exception(f"执行{task_type}类型任务失败 ({task_id}): {exec_e}")
+            return False
+    
+    def _archive_finished_tasks(self):
+        """把超过保留天数的已结束任务（success/failed）移入归档（每小时最多检查一次）"""
+        if not self._archive_after_days or self._archive_after_days <= 0:
+            return
+        now = time.time()
+        if now - self._last_archive_check < self._archive_check_interval:
+            return
+        self._last_archive_check = now
+        
+        try:
+            cutoff = now - self._archive_after_days * 86400
+            expired = []
+            for task in self.tasks:
+                if task.get("status") not in ("success", "failed"):
+                    continue
+                finished_at = to_epoch(task.get("updated_at") or task.get("created_at"))
+                if finished_at is not None and finished_at < cutoff:
+                    expired.append(task)
+            if not expired:
+                return
+            
+            # 先写归档再从热数据中删除，中途失败最多产生重复归档
+            self.archive.archive(expired)
+            expired_ids = {t.get("task_id") for t in expired}
+            self.tasks[:] = [t for t in self.tasks if t.get("task_id") not in expired_ids]
+            for task_id in expired_ids:
+                self._task_index.pop(task_id, None)
+                self._dirty.pop(task_id, None)
+            self.store.delete(self.tasks, expired_ids)
+            self.logger.info(f"归档了{len(expired)}个已结束任务")
+        except Exception as e:
+            self.logger.exception(f"归档任务失败: {e}")
+    
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务状态"""
-        return next((t for t in self.tasks if t.get("task_id") == task_id), None)
+        return self._task_index.get(task_id)
     
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """获取所有任务"""
@@ -194,3 +588,11 @@ class TaskManager:
     def get_tasks_by_type(self, task_type: str) -> List[Dict[str, Any]]:
         """获取特定类型的任务"""
         return [t for t in self.tasks if t.get("type") == task_type]
+    
+    def pending_media_sources(self) -> List[str]:
+        """待执行主动消息任务引用的媒体资源（缓存清理时保护对应文件）"""
+        return [
+            t.get("context") for t in self.tasks
+            if t.get("type") == "active_message" and t.get("status") in ("pending", "running")
+            and t.get("message_type") in ("image", "voice", "video", "file") and isinstance(t.get("context"), str)
+        ]
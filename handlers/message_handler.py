@@ -1,6 +1,6 @@
 import os
 import json
-from typing import Any
+from typing import Any, Optional
 
 from astrbot.api.event import AstrMessageEvent
 from ..storage.unified_store import UnifiedStore
@@ -12,7 +12,8 @@ from astrbot.api.event import MessageChain
 
 
 class MessageHandler:
-    def __init__(self, context, config_path: str, unified_store: UnifiedStore, logger, data_dir: str):
+    def __init__(self, context, config_path: str, unified_store: UnifiedStore, logger, data_dir: str,
+                 cache_utils: Optional[CacheUtils] = None):
         self.context = context
         self.config_path = config_path
         self._config = {}
@@ -32,8 +33,8 @@ class MessageHandler:
         # 初始化关键字处理器（使用 data_dir）
         self.keyword_handler = KeywordHandler(context, unified_store, logger, data_dir, self._config)
         
-        # 初始化缓存工具（使用 data_dir）
-        self.cache_utils = CacheUtils(data_dir)
+        # 初始化缓存工具（使用 data_dir，未传入时自行创建）
+        self.cache_utils = cache_utils or CacheUtils(data_dir)
         
         # 初始化规则处理器
         self.rule_processor = RuleProcessor(
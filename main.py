@@ -8,6 +8,7 @@ import json
 import asyncio
 import os
 from .storage.unified_store import UnifiedStore
+from .api.request import http_session
 from .core.task_manager import TaskManager
 from .handlers.message_handler import MessageHandler
 from .plugin_config.logger_manager import LoggerManager
@@ -15,6 +16,10 @@ from .storage.data_viewer import DataViewer
 from .scheduler.note_summary_task import NoteSummaryTask
 from .scheduler.todo_reminder_task import TodoReminderTask
 from .scheduler.todo_summary_task import TodoSummaryTask
+from .scheduler.timer_service import TimerService
+from .storage.cache_manager import CacheManager
+from .storage.cache_utils import CacheUtils
+from .storage.file_io import file_io
 from .todos.todo_manager import TodoManager
 from .users.user_manager import UsersManager
 
@@ -37,18 +42,38 @@ class MyPlugin(Star):
         
         # 用户数据存储在数据目录
         self.unified_store_path = os.path.join(self.data_dir, "unified_store.json")
-        self.unified_store = UnifiedStore(self.unified_store_path)
-        self.message_handler = MessageHandler(context, self.config_path, self.unified_store, logger, self.data_dir)
+        self.unified_store = UnifiedStore(
+            self.unified_store_path,
+            journal=config.get("unified_store_journal", False),
+            compact_threshold=config.get("unified_store_compact_kb", 1024) * 1024,
+            flush_interval=config.get("unified_store_flush_interval", 5)
+        )
+        # 规则回复与任务共用的富媒体缓存
+        self.cache_utils = CacheUtils(
+            self.data_dir,
+            max_download_mb=config.get("media_download_max_mb", 200),
+            download_timeout=config.get("media_download_timeout", 300)
+        )
+        self.message_handler = MessageHandler(
+            context, self.config_path, self.unified_store, logger, self.data_dir, cache_utils=self.cache_utils
+        )
         self.http_server = None
         self.task_manager = None
         self.note_summary_task = None
         self.todo_reminder_task = None
         self.todo_summary_task = None
+        self.cache_manager = None
         
         # 初始化配置和日志
         self.plugin_config = config
         self.log_manager = LoggerManager(self.data_dir, config)
-        self.data_viewer = DataViewer(self.data_dir)
+        # 任务执行、待办到期和每日汇总共用的定时器服务
+        self.timer_service = TimerService(self.log_manager)
+        self.data_viewer = DataViewer(
+            self.data_dir,
+            unified_store=self.unified_store,
+            task_backend=config.get("task_storage_backend", "json")
+        )
 
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
@@ -69,6 +94,38 @@ class MyPlugin(Star):
             log_mode = "详细" if enable_detail else "仅异常"
             self.log_manager.log(f"插件日志已启用，级别: {log_level}, 日志模式: {log_mode}", "INFO")
         
+        # 创建插件共享的 HTTP 会话（长连接复用 + DNS 缓存）
+        await http_session.start(
+            limit=self.plugin_config.get("http_max_connections", 100),
+            limit_per_host=self.plugin_config.get("http_max_connections_per_host", 10),
+            dns_cache_ttl=self.plugin_config.get("http_dns_cache_ttl", 300)
+        )
+        
+        # 创建共享的文件 I/O 线程池（媒体缓存与本地存储的写入、base64 解码）
+        file_io.start(max_workers=self.plugin_config.get("file_io_workers", 4))
+        
+        # 启动用户映射的后台定时落盘
+        self.unified_store.start_write_behind()
+        
+        # 启动共享定时器服务
+        self.timer_service.start()
+        
+        # 启动媒体缓存容量管理（按类型与总量上限淘汰最久未访问的文件）
+        self.cache_manager = CacheManager(
+            self.cache_utils,
+            self.log_manager,
+            self.timer_service,
+            max_total_mb=self.plugin_config.get("media_cache_max_mb", 2048),
+            type_max_mb={
+                media_type: self.plugin_config.get(f"media_cache_{media_type}_max_mb", 0)
+                for media_type in ("image", "voice", "video", "file")
+            },
+            policy=self.plugin_config.get("media_cache_policy", "lru"),
+            sweep_interval=self.plugin_config.get("media_cache_sweep_interval", 600),
+            protected_sources=lambda: self.task_manager.pending_media_sources() if self.task_manager else []
+        )
+        self.cache_manager.start()
+        
         # 初始化任务管理器
         enable_polling = self.plugin_config.get("enable_task_polling", False)
         if enable_polling:
@@ -76,7 +133,9 @@ class MyPlugin(Star):
                 self.data_dir,
                 self.plugin_config,
                 self.log_manager,
-                self.context
+                self.context,
+                timer_service=self.timer_service,
+                cache_utils=self.cache_utils
             )
             
             try:
@@ -84,6 +143,10 @@ class MyPlugin(Star):
                 self.log_manager.log("任务管理器已启动", "INFO")
             except Exception as e:
                 self.log_manager.log(f"启动任务管理器失败: {e}", "ERROR")
+            
+            # 启动任务推送服务（任务中心主动推送任务，免去轮询延迟）
+            if self.plugin_config.get("enable_webhook_server", False):
+                await self.start_webhook_server()
         else:
             self.log_manager.log("任务轮询已禁用，未启动任务管理器", "INFO")
         
@@ -96,7 +159,8 @@ class MyPlugin(Star):
             self.note_summary_task = NoteSummaryTask(
                 self.data_dir,
                 self.log_manager,
-                self.context
+                self.context,
+                self.timer_service
             )
             
             try:
@@ -122,7 +186,8 @@ class MyPlugin(Star):
                     todo_manager,
                     users_manager,
                     self.context,
-                    self.log_manager
+                    self.log_manager,
+                    self.timer_service
                 )
                 try:
                     self.todo_reminder_task.start()
@@ -140,7 +205,8 @@ class MyPlugin(Star):
                     todo_manager,
                     users_manager,
                     self.context,
-                    self.log_manager
+                    self.log_manager,
+                    self.timer_service
                 )
                 try:
                     await self.todo_summary_task.start(summary_hour, summary_minute)
@@ -150,6 +216,27 @@ class MyPlugin(Star):
         else:
             self.log_manager.log("待办功能已禁用", "INFO")
 
+    async def start_webhook_server(self):
+        """启动接收推送任务的本地 HTTP 服务"""
+        authorization = self.plugin_config.get("authorization", "")
+        if not authorization:
+            self.log_manager.log("未配置authorization，不启动任务推送服务", "WARNING")
+            return
+        try:
+            from .api.webhook_server import TaskWebhookServer
+            self.http_server = TaskWebhookServer(
+                self.task_manager,
+                authorization,
+                self.log_manager,
+                host=self.plugin_config.get("webhook_host", "0.0.0.0"),
+                port=self.plugin_config.get("webhook_port", 6190),
+                path=self.plugin_config.get("webhook_path", "/niancenter/tasks")
+            )
+            self._http_runner = await self.http_server.start()
+        except Exception as e:
+            self.http_server = None
+            self.log_manager.log(f"启动任务推送服务失败: {e}", "ERROR")
+
     @filter.command("niancenter_logs")
     async def view_logs(self, event: AstrMessageEvent):
         """查看插件日志"""
@@ -178,6 +265,30 @@ class MyPlugin(Star):
             if task_types:
                 msg += f"类型分布: {task_types}\n"
             
+            if self.task_manager:
+                polling = self.task_manager.get_polling_status()
+                msg += f"轮询间隔: {polling['interval']}秒，下次唤醒: {polling['next_wake_at']}（{polling['wake_reason']}）\n"
+                msg += f"待执行任务: {polling['pending_scheduled']}\n"
+                msg += f"执行中任务: {polling['running_tasks']}\n"
+                breaker = polling['breaker']
+                msg += f"任务中心连接: {breaker['state']}，连续失败: {breaker['failures']}次"
+                if breaker['state'] != "closed":
+                    msg += f"，下次试探: {breaker['next_probe_at']}"
+                msg += "\n"
+                outbox = self.task_manager.status_outbox.get_stats()
+                msg += f"状态更新: 待发送{outbox['pending']}，待重试{outbox['retry_depth']}"
+                if outbox['retry_depth']:
+                    msg += f"（最久{int(outbox['oldest_retry_age'])}秒）"
+                msg += "\n"
+                archived = self.task_manager.archive.stats()
+                msg += f"已归档任务: {archived['archived_total']}（{archived['archived_days']}天）\n"
+            
+            if self.cache_manager:
+                cache = self.cache_manager.get_stats()
+                msg += f"媒体缓存: {cache['total_bytes'] / 1048576:.1f}MB（{cache['files']}个文件），"
+                msg += f"累计淘汰{cache['evicted_files']}个/{cache['evicted_bytes'] / 1048576:.1f}MB，"
+                msg += f"命中{cache['cache']['hits']}次/未命中{cache['cache']['misses']}次\n"
+            
             yield event.plain_result(msg)
         except Exception as e:
             yield event.plain_result(f"获取任务失败: {e}")
@@ -191,6 +302,13 @@ class MyPlugin(Star):
             msg += f"总数: {summary.get('total', 0)}\n"
             msg += summary.get('message', '')
             
+            stats = self.unified_store.get_stats()
+            msg += (
+                f"\n写入: {stats['writes']}，跳过重复写入: {stats['skipped_writes']}\n"
+                f"落盘: {stats['flushes']}次/{stats['flushed_keys']}键，"
+                f"最近耗时: {stats['last_flush_ms']}ms，待落盘: {stats['pending_keys']}"
+            )
+            
             yield event.plain_result(msg)
         except Exception as e:
             yield event.plain_result(f"获取用户映射失败: {e}")
@@ -229,10 +347,20 @@ class MyPlugin(Star):
 
     async def terminate(self):
         """可选择实现异步的插件销毁方法，当插件被卸载/停用时会调用。"""
+        # 停止任务推送服务
+        if self.http_server:
+            try:
+                await self.http_server.stop()
+            except Exception as e:
+                self.log_manager.log(f"停止任务推送服务失败: {e}", "ERROR")
+            self.http_server = None
+            self._http_runner = None
+        
         # 停止后台任务轮询
         if self.task_manager:
             try:
                 await self.task_manager.stop_polling()
+                self.task_manager.close()
                 self.log_manager.log("任务管理器已停止", "INFO")
             except Exception as e:
                 self.log_manager.log(f"停止任务管理器失败: {e}", "ERROR")
@@ -261,5 +389,37 @@ class MyPlugin(Star):
             except Exception as e:
                 self.log_manager.log(f"停止待办总结任务失败: {e}", "ERROR")
         
+        # 停止媒体缓存清理（访问记录落盘）
+        if self.cache_manager:
+            try:
+                await self.cache_manager.stop()
+            except Exception as e:
+                self.log_manager.log(f"停止媒体缓存清理失败: {e}", "ERROR")
+        
+        # 停止共享定时器服务
+        try:
+            await self.timer_service.stop()
+        except Exception as e:
+            self.log_manager.log(f"停止定时器服务失败: {e}", "ERROR")
+        
+        # 关闭共享 HTTP 会话
+        try:
+            await http_session.close()
+        except Exception as e:
+            self.log_manager.log(f"关闭HTTP会话失败: {e}", "ERROR")
+        
+        # 关闭用户映射存储（落盘缓冲数据并等待后台日志合并完成）
+        try:
+            await self.unified_store.stop_write_behind()
+            self.unified_store.close()
+        except Exception as e:
+            self.log_manager.log(f"关闭用户映射存储失败: {e}", "ERROR")
+        
+        # 关闭文件 I/O 线程池（等待已提交的写入完成）
+        try:
+            file_io.close()
+        except Exception as e:
+            self.log_manager.log(f"关闭文件I/O线程池失败: {e}", "ERROR")
+        
         # 关闭日志
         self.log_manager.close()
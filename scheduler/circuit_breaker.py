@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def backoff_with_jitter(attempt: int, base_delay: float, max_delay: float, jitter: float = 0.5) -> float:
+    """第 attempt 次（从1开始）失败后的退避时间：指数增长，上限 max_delay，向下随机抖动"""
+    exponent = max(0, attempt - 1)
+    delay = min(max_delay, base_delay * (2 ** min(exponent, 16)))
+    return delay * (1 - jitter * random.random())
+
+
+class CircuitBreaker:
+    """任务中心调用的熔断器：closed（正常）/ open（熔断）/ half_open（试探）
+
+    连续失败达到阈值后进入 open，在退避时间内不再请求；到达试探时间后进入 half_open
+    放行一次请求，成功则恢复 closed，失败则以更长的退避时间重新 open。
+    退避时间按失败次数指数增长并带随机抖动，避免多个实例同时恢复请求。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, base_delay: float = 5.0, max_delay: float = 600.0,
+                 jitter: float = 0.5):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = max(0.1, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        # 抖动比例：实际等待时间在 [delay * (1 - jitter), delay] 之间
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.total_failures = 0
+        self.opened_count = 0
+        self.next_probe_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """是否允许发起请求；open 状态到达试探时间时转为 half_open 并放行"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.time() if now is None else now
+        if self.state == self.OPEN and self.next_probe_at is not None and now >= self.next_probe_at:
+            self.state = self.HALF_OPEN
+        return self.state == self.HALF_OPEN
+
+    def backoff_delay(self) -> float:
+        """按当前连续失败次数计算带抖动的退避时间（秒）"""
+        return backoff_with_jitter(self.failures, self.base_delay, self.max_delay, self.jitter)
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.next_probe_at = None
+        self.last_error = None
+
+    def record_failure(self, error: Optional[str] = None, now: Optional[float] = None) -> float:
+        """记录一次失败，返回建议的下次重试时间（epoch 秒）"""
+        now = time.time() if now is None else now
+        self.failures += 1
+        self.total_failures += 1
+        if error:
+            self.last_error = error
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+            self.state = self.OPEN
+        self.next_probe_at = now + self.backoff_delay()
+        return self.next_probe_at
+
+    def get_status(self) -> Dict[str, Any]:
+        next_probe = None
+        if self.next_probe_at is not None:
+            next_probe = datetime.fromtimestamp(self.next_probe_at).strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "total_failures": self.total_failures,
+            "opened_count": self.opened_count,
+            "next_probe_at": next_probe,
+            "last_error": self.last_error,
+        }
@@ -2,7 +2,6 @@
 每日笔记汇总任务
 """
 import os
-import asyncio
 from datetime import datetime
 from typing import Dict, Any
 
@@ -10,7 +9,7 @@ from typing import Dict, Any
 class NoteSummaryTask:
     """每日笔记汇总任务"""
     
-    def __init__(self, data_dir: str, logger, context):
+    def __init__(self, data_dir: str, logger, context, timer_service):
         """
         初始化笔记汇总任务
         
@@ -18,13 +17,15 @@ class NoteSummaryTask:
             data_dir: 数据目录
             logger: 日志记录器
             context: AstrBot上下文
+            timer_service: 共享定时器服务
         """
         self.data_dir = data_dir
         self.logger = logger
         self.context = context
         self.users_dir = os.path.join(data_dir, "users")
+        self.timer_service = timer_service
         self.is_running = False
-        self.task = None
+        self.timer = None
     
     async def _send_summary_to_user(self, user_id: str, summary_file: str):
         """
@@ -113,43 +114,12 @@ class NoteSummaryTask:
         except Exception as e:
             self.logger.exception(f"生成每日汇总失败: {e}")
     
-    async def _schedule_task(self, hour: int = 22, minute: int = 0):
-        """
-        定时任务调度器
-        
-        Args:
-            hour: 执行小时 (0-23)
-            minute: 执行分钟 (0-59)
-        """
-        while self.is_running:
-            try:
-                now = datetime.now()
-                target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                
-                # 如果目标时间已过，设置为明天
-                if now >= target_time:
-                    from datetime import timedelta
-                    target_time += timedelta(days=1)
-                
-                # 计算等待时间
-                wait_seconds = (target_time - now).total_seconds()
-                
-                self.logger.info(f"笔记汇总任务将在 {target_time.strftime('%Y-%m-%d %H:%M:%S')} 执行")
-                
-                # 等待到目标时间
-                await asyncio.sleep(wait_seconds)
-                
-                # 执行汇总任务
-                if self.is_running:
-                    self.logger.info("开始执行每日笔记汇总任务")
-                    await self._generate_daily_summaries()
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                self.logger.exception(f"定时任务执行失败: {e}")
-                # 出错后等待1小时再重试
-                await asyncio.sleep(3600)
+    async def _run_scheduled(self):
+        """定时器回调：执行每日笔记汇总"""
+        if not self.is_running:
+            return
+        self.logger.info("开始执行每日笔记汇总任务")
+        await self._generate_daily_summaries()
     
     async def start(self, hour: int = 22, minute: int = 0):
         """
@@ -164,7 +134,9 @@ class NoteSummaryTask:
             return
         
         self.is_running = True
-        self.task = asyncio.create_task(self._schedule_task(hour, minute))
+        # 由共享定时器服务在每天的目标时间唤醒，不再常驻睡眠循环
+        self.timer = self.timer_service.call_daily(hour, minute, self._run_scheduled)
+        self.logger.info(f"笔记汇总任务将在 {self.timer.next_run.strftime('%Y-%m-%d %H:%M:%S')} 执行")
         self.logger.info(f"笔记汇总任务已启动，每天 {hour:02d}:{minute:02d} 执行")
     
     async def stop(self):
@@ -173,12 +145,9 @@ class NoteSummaryTask:
             return
         
         self.is_running = False
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
         
         self.logger.info("笔记汇总任务已停止")
     
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from ..api.request import check_update_response, fetch_json, fetch_json_with_meta, parse_batch_update_response
+from ..storage.journal import atomic_write_json
+from .circuit_breaker import backoff_with_jitter
+
+
+class StatusUpdateOutbox:
+    """任务状态远程更新的发件箱：收集状态变化后批量发送
+
+    同一任务在一个批次内的多次变化只发送最后一次。任务中心支持批量接口时发送
+    POST {"type": "batch_update", "updates": [...]}，否则逐个发送 type=update 请求。
+    bulk_mode: auto（先尝试批量，任务中心不支持时自动降级）/ on / off
+
+    发送失败的更新写入 state_file（重试队列），后台按指数退避重试，插件重启后继续重试；
+    超过 max_retry_age 秒仍未成功的更新丢弃并记录错误日志。
+    """
+
+    def __init__(self, task_center_url: str, authorization: str, logger,
+                 batch_size: int = 50, flush_interval: float = 1.0, bulk_mode: str = "auto",
+                 state_file: Optional[str] = None, retry_base_delay: float = 5.0,
+                 retry_max_delay: float = 600.0, max_retry_age: float = 7 * 86400):
+        self.task_center_url = task_center_url
+        self.authorization = authorization
+        self.logger = logger
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.bulk_mode = (bulk_mode or "auto").lower()
+        # None=未知，auto 模式下首次批量请求后确定
+        self._bulk_supported: Optional[bool] = None if self.bulk_mode == "auto" else self.bulk_mode == "on"
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._single_semaphore = asyncio.Semaphore(5)
+        self._stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "batches": 0,
+            "bulk_requests": 0,
+            "single_requests": 0,
+            "failed": 0,
+            "retried": 0,
+            "recovered": 0,
+            "dropped": 0,
+        }
+        # 重试队列：task_id -> 更新 + attempts / first_failed_at / next_retry_at / last_error
+        self.state_file = state_file
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = max(retry_base_delay, retry_max_delay)
+        self.max_retry_age = max_retry_age
+        self._retry: Dict[Any, Dict[str, Any]] = self._load_retry_queue()
+
+    def _load_retry_queue(self) -> Dict[Any, Dict[str, Any]]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            retry = {entry["task_id"]: entry for entry in entries if isinstance(entry, dict) and "task_id" in entry}
+            if retry:
+                self.logger.info(f"恢复{len(retry)}个待重试的任务状态更新")
+            return retry
+        except Exception as e:
+            self.logger.exception(f"加载状态更新重试队列失败: {e}")
+            return {}
+
+    def _save_retry_queue(self):
+        if not self.state_file:
+            return
+        try:
+            atomic_write_json(self.state_file, list(self._retry.values()), indent=None)
+        except Exception as e:
+            self.logger.exception(f"保存状态更新重试队列失败: {e}")
+
+    def enqueue(self, task_id: Any, status: str, result: Optional[dict] = None):
+        """加入一条状态更新（不等待发送）"""
+        self._stats["enqueued"] += 1
+        if task_id in self._retry:
+            # 新的状态直接替换重试队列中的旧状态并立即到期：先持久化，由下次 flush 发送，重启后也不会丢失
+            self._pending.pop(task_id, None)
+            self._retry[task_id] = {
+                "task_id": task_id, "status": status, "result": result,
+                "attempts": 0, "first_failed_at": time.time(), "next_retry_at": 0,
+            }
+            self._save_retry_queue()
+            self._wakeup.set()
+            return
+        if task_id in self._pending:
+            self._stats["coalesced"] += 1
+        self._pending[task_id] = {"task_id": task_id, "status": status, "result": result}
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止后台发送并发送剩余更新"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception(f"批量更新任务状态失败: {e}")
+
+    async def flush(self, retry_all: bool = False):
+        """发送当前所有待发送的更新，以及到达重试时间的失败更新
+
+        retry_all 为 True 时不等待退避时间，重试队列中的更新全部重新发送。
+        """
+        retry_keys = set(self._take_due_retries(retry_all))
+        changed = bool(retry_keys)
+        while self._pending:
+            keys = list(self._pending.keys())[:self.batch_size]
+            batch = [self._pending.pop(k) for k in keys]
+            self._stats["batches"] += 1
+            failed = await self._send_batch(batch)
+            # 发送期间又有新的状态入队时，旧状态不再重试
+            failed = [u for u in failed if u["task_id"] not in self._pending and u["task_id"] not in self._retry]
+            for update in failed:
+                self._schedule_retry(update)
+            changed = changed or bool(failed)
+            failed_ids = {update["task_id"] for update in failed}
+            self._stats["recovered"] += sum(
+                1 for update in batch if update["task_id"] in retry_keys and update["task_id"] not in failed_ids
+            )
+        if changed:
+            self._save_retry_queue()
+
+    def _take_due_retries(self, retry_all: bool = False) -> List[Any]:
+        """把到达重试时间的失败更新移回待发送队列，返回这些 task_id"""
+        if not self._retry:
+            return []
+        now = time.time()
+        due = []
+        dropped = False
+        for task_id, entry in list(self._retry.items()):
+            if now - entry.get("first_failed_at", now) > self.max_retry_age:
+                self._retry.pop(task_id)
+                self._stats["dropped"] += 1
+                dropped = True
+                self.logger.error(f"任务 {task_id} 状态更新重试超时，已放弃: {entry.get('last_error')}")
+                continue
+            if task_id in self._pending or not (retry_all or entry.get("next_retry_at", 0) <= now):
+                continue
+            self._pending[task_id] = self._retry.pop(task_id)
+            self._stats["retried"] += 1
+            due.append(task_id)
+        if dropped:
+            self._save_retry_queue()
+        return due
+
+    def _schedule_retry(self, update: Dict[str, Any]):
+        now = time.time()
+        attempts = update.get("attempts", 0) + 1
+        entry = {
+            "task_id": update["task_id"],
+            "status": update["status"],
+            "result": update.get("result"),
+            "attempts": attempts,
+            "first_failed_at": update.get("first_failed_at", now),
+            "next_retry_at": now + backoff_with_jitter(attempts, self.retry_base_delay, self.retry_max_delay),
+            "last_error": update.get("last_error"),
+        }
+        self._retry[update["task_id"]] = entry
+
+    async def _send_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """发送一批更新，返回发送失败的更新"""
+        headers = {"Authorization": self.authorization}
+        if self._bulk_supported is not False and len(batch) > 1:
+            failed = await self._send_bulk(batch, headers)
+            if failed is not None:
+                return failed
+        results = await asyncio.gather(*(self._send_single(update, headers) for update in batch))
+        return [update for update, ok in zip(batch, results) if not ok]
+
+    async def _send_bulk(self, batch: List[Dict[str, Any]], headers: dict) -> Optional[List[Dict[str, Any]]]:
+        """批量发送，返回失败的更新；批量接口不可用时返回 None（改为逐个发送）"""
+        updates = [{"task_id": u["task_id"], "status": u["status"], "result": u.get("result")} for u in batch]
+        payload = {"type": "batch_update", "updates": updates}
+        try:
+            self._stats["bulk_requests"] += 1
+            if self.logger.should_log_detail():
+                self.logger.debug(f"批量更新任务状态 - 数量: {len(batch)}")
+            resp = await fetch_json(self.task_center_url, method="POST", params=payload, headers=headers)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 网络错误不代表不支持批量接口，本批次降级为逐个发送
+            self.logger.warning(f"批量更新任务状态请求失败，改为逐个发送: {e}")
+            return None
+        failed_ids = parse_batch_update_response(resp)
+        if failed_ids is not None:
+            self._bulk_supported = True
+            failed = [update for update in batch if str(update["task_id"]) in failed_ids]
+            for update in failed:
+                update["last_error"] = "任务中心批量更新返回失败"
+            self._stats["failed"] += len(failed)
+            self.logger.debug(f"批量更新了{len(batch) - len(failed)}个任务状态")
+            return failed
+        if self.bulk_mode == "auto":
+            self._bulk_supported = False
+            self.logger.info("任务中心不支持批量状态更新（响应缺少 updated/failed 字段），后续改为逐个发送")
+        return None
+
+    async def _send_single(self, update: Dict[str, Any], headers: dict) -> bool:
+        task_id = update["task_id"]
+        params = {
+            "type": "update",
+            "task_id": task_id,
+            "status": update["status"]
+        }
+        if update.get("result"):
+            params["result"] = json.dumps(update["result"])
+        async with self._single_semaphore:
+            try:
+                self._stats["single_requests"] += 1
+                # fetch_json 不会因 HTTP 错误抛出异常，需检查状态码和响应体
+                status, _, body = await fetch_json_with_meta(
+                    self.task_center_url, method="GET", params=params, headers=headers
+                )
+                check_update_response(status, body)
+                self.logger.debug(f"任务 {task_id} 状态更新为 {update['status']}")
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as remote_e:
+                self._stats["failed"] += 1
+                update["last_error"] = str(remote_e)
+                self.logger.warning(f"更新远程任务状态失败 {task_id}，稍后重试: {remote_e}")
+                return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["pending"] = len(self._pending)
+        stats["bulk_supported"] = self._bulk_supported
+        stats["retry_depth"] = len(self._retry)
+        oldest = min((entry.get("first_failed_at", time.time()) for entry in self._retry.values()), default=None)
+        stats["oldest_retry_age"] = round(time.time() - oldest, 1) if oldest is not None else 0
+        return stats
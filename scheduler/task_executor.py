@@ -6,7 +6,7 @@ from ..api.request import fetch_json
 
 class TaskExecutor:
     def __init__(self, logger, context, task_center_url: str, authorization: str, 
-                 cache_utils, message_chain_builder, save_callback):
+                 cache_utils, message_chain_builder, save_callback, status_outbox=None):
         self.logger = logger
         self.context = context
         self.task_center_url = task_center_url
@@ -14,6 +14,8 @@ class TaskExecutor:
         self.cache_utils = cache_utils
         self.message_chain_builder = message_chain_builder
         self.save_callback = save_callback
+        # 远程状态更新发件箱，未提供时逐个同步发送
+        self.status_outbox = status_outbox
 
     async def execute_active_message(self, task: Dict[str, Any]):
         task_id = task.get("task_id", "unknown")
@@ -70,8 +72,10 @@ class TaskExecutor:
             task["updated_at"] = datetime.utcnow().isoformat() + "Z"
             if result:
                 task["result"] = result
-            self.save_callback()
-            if self.authorization:
+            self.save_callback([task])
+            if self.authorization and self.status_outbox:
+                self.status_outbox.enqueue(task_id, status, result)
+            elif self.authorization:
                 try:
                     headers = {"Authorization": self.authorization}
                     params = {
@@ -1,105 +1,430 @@
 import asyncio
+import json
+import os
 from datetime import datetime, timedelta
-from ..api.request import fetch_json
+from typing import Optional
+from ..api.request import check_update_response, fetch_json, fetch_json_with_meta, parse_batch_update_response
+from ..storage.journal import atomic_write_json
+from .timestamps import cached_epoch, to_epoch
 
 class TaskSyncManager:
-    def __init__(self, task_center_url: str, authorization: str, logger, tasks_list, save_callback):
+    def __init__(self, task_center_url: str, authorization: str, logger, tasks_list, save_callback,
+                 on_new_task=None, task_index=None, state_file=None,
+                 mark_concurrency: int = 10, bulk_mode: str = "auto",
+                 page_size: int = 100, max_pages: int = 100, archive=None):
         self.task_center_url = task_center_url
         self.authorization = authorization
         self.logger = logger
         self.tasks = tasks_list
         self.save_callback = save_callback
+        # 新任务入库后的回调（用于加入执行调度）
+        self.on_new_task = on_new_task
+        # task_id -> 任务记录索引（通常由 TaskManager 共享传入）
+        if task_index is None:
+            task_index = {t.get("task_id"): t for t in reversed(tasks_list) if t.get("task_id") is not None}
+        self.task_index = task_index
         self._last_sync_time = None
+        # 标记已同步：并发上限、批量确认（auto/on/off）、失败重试
+        self._mark_semaphore = asyncio.Semaphore(max(1, mark_concurrency))
+        self.bulk_mode = (bulk_mode or "auto").lower()
+        self._bulk_supported = None if self.bulk_mode == "auto" else self.bulk_mode == "on"
+        self.max_sync_retries = 5
+        self._unsynced_ids = {
+            t.get("task_id") for t in tasks_list
+            if t.get("task_id") is not None and not t.get("synced") and t.get("sync_failures")
+        }
+        # 增量同步状态：水位线（已见到的最新 created_at）与条件请求头
+        self.state_file = state_file
+        self._sync_state = self._load_sync_state()
+        # 水位线回退的重叠时间，容忍任务中心写入延迟和时钟误差
+        self.watermark_overlap = timedelta(minutes=5)
+        # 分页拉取：每页任务数与单次同步最多拉取的页数
+        self.page_size = max(1, page_size)
+        self.max_pages = max(1, max_pages)
+        # 已归档任务（TaskArchive）：已移出本地列表，再次收到时按重复任务处理，不再执行
+        self.archive = archive
 
-    async def sync_tasks(self):
+    def _load_sync_state(self) -> dict:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except Exception as e:
+            self.logger.exception(f"加载同步状态失败: {e}")
+            return {}
+
+    def _save_sync_state(self):
+        if not self.state_file:
+            return
+        try:
+            atomic_write_json(self.state_file, self._sync_state)
+        except Exception as e:
+            self.logger.exception(f"保存同步状态失败: {e}")
+
+    def _created_after(self, now: datetime) -> str:
+        """有水位线时从水位线（减去重叠时间）开始拉取，否则拉取最近24小时"""
+        watermark_ts = to_epoch(self._sync_state.get("watermark"))
+        if watermark_ts is None:
+            return (now - timedelta(hours=24)).isoformat() + "Z"
+        start = datetime.utcfromtimestamp(watermark_ts) - self.watermark_overlap
+        return start.isoformat() + "Z"
+
+    def _advance_watermark(self, tasks: list):
+        latest = self._sync_state.get("watermark")
+        latest_ts = to_epoch(latest)
+        for task in tasks:
+            if not isinstance(task, dict):
+                continue
+            created_ts = to_epoch(task.get("created_at"))
+            if created_ts is not None and (latest_ts is None or created_ts > latest_ts):
+                latest, latest_ts = task.get("created_at"), created_ts
+        if latest is not None:
+            self._sync_state["watermark"] = latest
+
+    def get_sync_state(self) -> dict:
+        return dict(self._sync_state)
+
+    async def sync_tasks(self) -> Optional[int]:
+        """同步任务，返回新增任务数；未配置或同步失败时返回 None"""
         if not self.authorization:
             self.logger.warning("未配置authorization，跳过任务同步")
-            return
+            return None
         try:
             headers = {"Authorization": self.authorization}
             now = datetime.utcnow()
-            created_after = (now - timedelta(hours=24)).isoformat() + "Z"
+            created_after = self._created_after(now)
             created_before = now.isoformat() + "Z"
             self.logger.info("开始同步任务...")
-            await self._fetch_and_sync_all_tasks(created_after, created_before, headers)
+            sync_count = await self._fetch_and_sync_all_tasks(created_after, created_before, headers)
+            if sync_count is None:
+                return None
             self._last_sync_time = datetime.utcnow()
             self.logger.info("任务同步完成")
+            return sync_count
         except asyncio.CancelledError:
             raise
         except Exception as e:
             self.logger.exception(f"任务同步失败: {e}")
+            return None
 
     async def _fetch_and_sync_all_tasks(self, created_after: str, created_before: str, headers: dict):
+        """分页拉取并合并未同步任务，每页处理完立即落盘并记录进度
+
+        请求参数带 limit 以及 cursor 或 page。任务中心返回 next_cursor 时按游标翻页；
+        返回 has_more 或整页数据时按页码翻页；不支持分页的任务中心一次返回全部任务，
+        拉取一页即结束。内存中只保留当前一页。
+        """
+        base_params = {
+            "type": "get",
+            "synced": "false",
+            "created_after": created_after,
+            "created_before": created_before,
+            "limit": self.page_size
+        }
+        # 上次分页同步中断时从保存的游标继续
+        cursor = self._sync_state.get("cursor")
+        resumed_cursor = cursor
+        page = 1
+        sync_count = 0
+        fetched_pages = 0
+        first_meta = None
+        previous_ids = None
+        # 页码翻页时部分任务确认失败会导致后续页偏移，此后不再推进水位线
+        advance_watermark = True
         try:
-            params = {
-                "type": "get",
-                "synced": "false",
-                "created_after": created_after,
-                "created_before": created_before
-            }
-            if self.logger.should_log_detail():
-                self.logger.debug(f"获取任务 - URL: {self.task_center_url}")
-                self.logger.debug(f"获取任务 - 请求参数: {params}")
-                self.logger.debug(f"获取任务 - 请求头: {headers}")
-            resp = await fetch_json(
-                self.task_center_url,
-                method="GET",
-                params=params,
-                headers=headers
-            )
-            if self.logger.should_log_detail():
-                self.logger.debug(f"获取任务 - 响应: {resp}")
-            new_tasks = resp.get("data", []) if isinstance(resp, dict) else (resp if isinstance(resp, list) else [])
-            sync_count = 0
-            for task in new_tasks:
-                if isinstance(task, dict):
-                    try:
-                        task_id = task.get("task_id")
-                        if not task_id:
-                            self.logger.warning("任务缺少task_id")
-                            continue
-                        try:
-                            await self._mark_task_synced(task_id, headers)
-                            task_record = next((t for t in self.tasks if t.get("task_id") == task_id), None)
-                            if task_record:
-                                task_record["synced"] = True
-                        except Exception as e:
-                            self.logger.exception(f"标记{task_id}同步失败: {e}")
-                        existing = next((t for t in self.tasks if t.get("task_id") == task_id), None)
-                        if not existing:
-                            content = task.get("content", {})
-                            task_type = task.get("task_type", "unknown")
-                            local_task = {
-                                "task_id": task_id,
-                                "type": task_type,
-                                "unified_msg_origin": content.get("unified_msg_origin"),
-                                "message_type": content.get("type", "text"),
-                                "context": content.get("context", ""),
-                                "execution_time": task.get("execution_time"),
-                                "created_at": task.get("created_at"),
-                                "status": task.get("status", "pending"),
-                                "synced": task.get("synced", False),
-                                "result": task.get("result")
-                            }
-                            self.tasks.append(local_task)
-                            sync_count += 1
-                            self.logger.info(f"添加新任务: {task_id} (类型: {task_type})")
-                            try:
-                                await self._mark_task_synced(task_id, headers)
-                                local_task["synced"] = True
-                            except Exception as e:
-                                self.logger.exception(f"标记{task_id}同步失败: {e}")
-                    except Exception as e:
-                        self.logger.exception(f"处理任务失败: {e}")
-            if sync_count > 0:
-                self.save_callback()
-                self.logger.info(f"同步了{sync_count}个新任务並更新了synced状态")
+            while True:
+                if fetched_pages >= self.max_pages:
+                    self.logger.warning(f"本次同步已拉取{fetched_pages}页，剩余任务下次继续")
+                    break
+                params = dict(base_params)
+                if cursor:
+                    params["cursor"] = cursor
+                else:
+                    params["page"] = page
+                # 条件请求只用于第一页：任务中心支持时，无新任务可直接返回 304
+                conditional = fetched_pages == 0 and not cursor
+                status, resp_headers, resp = await self._fetch_page(params, headers, conditional)
+                fetched_pages += 1
+                if status == 304:
+                    # 无新任务，仍需继续执行后面的标记失败重试
+                    self.logger.debug("获取任务 - 无新任务 (304)")
+                    break
+                if conditional:
+                    first_meta = resp_headers
+                new_tasks = resp.get("data", []) if isinstance(resp, dict) else (resp if isinstance(resp, list) else [])
+
+                # 任务中心忽略分页参数时会重复返回同一页，避免死循环
+                page_ids = [t.get("task_id") for t in new_tasks if isinstance(t, dict)]
+                if page_ids and page_ids == previous_ids:
+                    break
+                previous_ids = page_ids
+
+                new_count, all_marked = await self._sync_page(new_tasks, headers)
+                sync_count += new_count
+                if not cursor and not all_marked:
+                    advance_watermark = False
+                if advance_watermark:
+                    self._advance_watermark(new_tasks)
+
+                next_position = self._next_page(resp, new_tasks, cursor, page, all_marked)
+                if next_position is None:
+                    self._sync_state.pop("cursor", None)
+                else:
+                    cursor, page = next_position
+                    if cursor:
+                        self._sync_state["cursor"] = cursor
+                # 每页落盘一次进度：水位线和续传游标
+                self._save_sync_state()
+                if next_position is None:
+                    break
         except asyncio.CancelledError:
             raise
         except Exception as e:
             self.logger.exception(f"获取任务失败: {e}")
+            # 第一页就失败视为同步失败；之后的页失败时已处理的页保留，下次继续
+            if fetched_pages <= 1:
+                if resumed_cursor and self._sync_state.get("cursor") == resumed_cursor:
+                    # 续传游标可能已被任务中心拒绝或过期，丢弃后下次从第一页重新拉取
+                    self._sync_state.pop("cursor", None)
+                    self._save_sync_state()
+                    self.logger.warning("使用保存的游标续传失败，下次同步从第一页开始")
+                return None
 
-    async def _mark_task_synced(self, task_id: str, headers: dict):
+        # 上次标记失败的本地任务一并重试
+        await self._retry_unsynced(headers)
+
+        # 记录条件请求头，下次无新任务时可直接返回 304
+        if first_meta is not None:
+            if first_meta.get("ETag"):
+                self._sync_state["etag"] = first_meta["ETag"]
+            if first_meta.get("Last-Modified"):
+                self._sync_state["last_modified"] = first_meta["Last-Modified"]
+            self._save_sync_state()
+        if sync_count > 0:
+            self.logger.info(f"同步了{sync_count}个新任务並更新了synced状态")
+        return sync_count
+
+    async def _fetch_page(self, params: dict, headers: dict, conditional: bool):
+        """拉取一页任务，返回 (status, headers, body)；HTTP 错误时抛出异常"""
+        if self.logger.should_log_detail():
+            self.logger.debug(f"获取任务 - URL: {self.task_center_url}")
+            self.logger.debug(f"获取任务 - 请求参数: {params}")
+            self.logger.debug(f"获取任务 - 请求头: {headers}")
+        request_headers = dict(headers)
+        if conditional:
+            if self._sync_state.get("etag"):
+                request_headers["If-None-Match"] = self._sync_state["etag"]
+            if self._sync_state.get("last_modified"):
+                request_headers["If-Modified-Since"] = self._sync_state["last_modified"]
+        status, resp_headers, resp = await fetch_json_with_meta(
+            self.task_center_url,
+            method="GET",
+            params=params,
+            headers=request_headers
+        )
+        if status != 304 and self.logger.should_log_detail():
+            self.logger.debug(f"获取任务 - 响应: {resp}")
+        if status >= 400:
+            raise Exception(f"获取任务失败: HTTP {status}")
+        return status, resp_headers, resp
+
+    async def _sync_page(self, new_tasks: list, headers: dict):
+        """合并一页任务并确认同步，返回 (新增任务数, 本页任务是否全部确认成功)"""
+        sync_count, changed, to_mark, archived_ids = self._merge_remote_tasks(new_tasks)
+        if to_mark:
+            changed.extend(await self._mark_records_synced(to_mark, headers))
+        if changed:
+            self.save_callback(changed)
+        all_marked = all(record.get("synced") for record in to_mark.values())
+        if archived_ids:
+            all_marked = await self._confirm_archived(archived_ids, headers) and all_marked
+        return sync_count, all_marked
+
+    def _next_page(self, resp, new_tasks: list, cursor, page: int, all_marked: bool):
+        """计算下一页的 (cursor, page)，没有下一页时返回 None"""
+        if not new_tasks:
+            return None
+        next_cursor = resp.get("next_cursor") if isinstance(resp, dict) else None
+        if next_cursor:
+            return next_cursor, page
+        if cursor:
+            # 游标翻页到最后一页
+            return None
+        has_more = resp.get("has_more") if isinstance(resp, dict) else None
+        if has_more is False:
+            return None
+        if has_more is None and len(new_tasks) < self.page_size:
+            return None
+        # 查询条件是 synced=false：本页全部确认成功后，后续任务会前移到当前页
+        return None, page if all_marked else page + 1
+
+    async def _retry_unsynced(self, headers: dict):
+        """重试之前标记已同步失败的本地任务"""
+        to_mark = {}
+        for task_id in list(self._unsynced_ids):
+            record = self.task_index.get(task_id)
+            if record is None or record.get("synced"):
+                self._unsynced_ids.discard(task_id)
+            else:
+                to_mark[task_id] = record
+        if to_mark:
+            changed = await self._mark_records_synced(to_mark, headers)
+            if changed:
+                self.save_callback(changed)
+
+    def _merge_remote_tasks(self, remote_tasks: list):
+        """把任务中心格式的任务合并到本地列表
+
+        Returns:
+            (新增任务数, 发生变化的记录列表, 需要标记已同步的 task_id -> 记录, 已归档的 task_id 列表)
+        """
+        sync_count = 0
+        changed = []
+        # 本次需要标记为已同步的任务（去重）
+        to_mark = {}
+        archived_ids = []
+        for task in remote_tasks:
+            if isinstance(task, dict):
+                try:
+                    task_id = task.get("task_id")
+                    if not task_id:
+                        self.logger.warning("任务缺少task_id")
+                        continue
+                    existing = self.task_index.get(task_id)
+                    if not existing and self.archive is not None and self.archive.contains(task_id):
+                        # 已执行并归档的任务被重新投递，只确认同步，不再入库执行
+                        if task_id not in archived_ids:
+                            archived_ids.append(task_id)
+                        continue
+                    if not existing:
+                        local_task = self._to_local_task(task)
+                        self.tasks.append(local_task)
+                        self.task_index[task_id] = local_task
+                        changed.append(local_task)
+                        if self.on_new_task:
+                            self.on_new_task(local_task)
+                        sync_count += 1
+                        self.logger.info(f"添加新任务: {task_id} (类型: {local_task['type']})")
+                        existing = local_task
+                    to_mark[task_id] = existing
+                except Exception as e:
+                    self.logger.exception(f"处理任务失败: {e}")
+        if archived_ids:
+            self.logger.info(f"跳过{len(archived_ids)}个已归档的重复任务")
+        return sync_count, changed, to_mark, archived_ids
+
+    async def _confirm_archived(self, task_ids: list, headers: dict) -> bool:
+        """向任务中心确认已归档任务的同步状态（不修改本地记录），返回是否全部确认成功"""
+        if self._bulk_supported is not False and len(task_ids) > 1:
+            succeeded = await self._mark_tasks_synced_bulk(task_ids, headers)
+            if succeeded is not None:
+                return len(succeeded) == len(task_ids)
+        results = await asyncio.gather(*(self._mark_task_synced(task_id, headers) for task_id in task_ids))
+        return all(results)
+
+    async def ingest_pushed_tasks(self, remote_tasks: list) -> dict:
+        """接收推送的任务（与轮询返回的任务格式相同），合并后确认同步"""
+        sync_count, changed, to_mark, archived_ids = self._merge_remote_tasks(remote_tasks)
+        if changed:
+            self.save_callback(changed)
+        # 推送可能重复投递，已确认过的任务不再标记
+        unsynced = {task_id: record for task_id, record in to_mark.items() if not record.get("synced")}
+        if (unsynced or archived_ids) and self.authorization:
+            headers = {"Authorization": self.authorization}
+            if unsynced:
+                marked = await self._mark_records_synced(unsynced, headers)
+                if marked:
+                    self.save_callback(marked)
+            if archived_ids:
+                await self._confirm_archived(archived_ids, headers)
+        return {"accepted": sync_count, "duplicates": len(to_mark) - sync_count + len(archived_ids)}
+
+    def _to_local_task(self, task: dict) -> dict:
+        """把任务中心的任务转换为本地任务记录"""
+        content = task.get("content", {}) or {}
+        local_task = {
+            "task_id": task.get("task_id"),
+            "type": task.get("task_type", "unknown"),
+            "unified_msg_origin": content.get("unified_msg_origin"),
+            "message_type": content.get("type", "text"),
+            "context": content.get("context", ""),
+            "execution_time": task.get("execution_time"),
+            "created_at": task.get("created_at"),
+            "status": task.get("status", "pending"),
+            "synced": task.get("synced", False),
+            "result": task.get("result")
+        }
+        # 入库时解析一次执行时间，调度时直接比较 epoch 秒
+        cached_epoch(local_task, "execution_time")
+        return local_task
+
+    async def _mark_records_synced(self, records: dict, headers: dict) -> list:
+        """标记一批任务为已同步，更新本地记录并返回发生变化的记录
+
+        优先发送一次批量确认，任务中心不支持时在并发上限内逐个标记。
+        标记失败的任务累加 sync_failures，下次同步时重试。
+        """
+        task_ids = list(records.keys())
+        succeeded = None
+        if self._bulk_supported is not False and len(task_ids) > 1:
+            succeeded = await self._mark_tasks_synced_bulk(task_ids, headers)
+        if succeeded is None:
+            results = await asyncio.gather(*(self._mark_task_synced(task_id, headers) for task_id in task_ids))
+            succeeded = {task_id for task_id, ok in zip(task_ids, results) if ok}
+
+        changed = []
+        for task_id, record in records.items():
+            if task_id in succeeded:
+                if not record.get("synced") or "sync_failures" in record:
+                    record["synced"] = True
+                    record.pop("sync_failures", None)
+                    changed.append(record)
+                self._unsynced_ids.discard(task_id)
+            else:
+                record["sync_failures"] = record.get("sync_failures", 0) + 1
+                changed.append(record)
+                if record["sync_failures"] < self.max_sync_retries:
+                    self._unsynced_ids.add(task_id)
+                else:
+                    self._unsynced_ids.discard(task_id)
+                    self.logger.warning(f"任务 {task_id} 标记同步连续失败{record['sync_failures']}次，不再重试")
+        failed = len(task_ids) - len(succeeded)
+        if failed:
+            self.logger.warning(f"{failed}个任务标记同步失败，将在下次同步时重试")
+        return changed
+
+    async def _mark_tasks_synced_bulk(self, task_ids: list, headers: dict):
+        """批量确认同步，成功返回已确认的 task_id 集合，不支持或失败返回 None"""
+        payload = {
+            "type": "batch_update",
+            "updates": [{"task_id": task_id, "synced": True} for task_id in task_ids]
+        }
+        try:
+            resp = await fetch_json(self.task_center_url, method="POST", params=payload, headers=headers)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"批量标记任务同步失败，改为逐个标记: {e}")
+            return None
+        failed_ids = parse_batch_update_response(resp)
+        if failed_ids is not None:
+            self._bulk_supported = True
+            # 任务中心返回逐个失败的 id 时，只把其余任务视为成功（id 统一按字符串比较）
+            succeeded = {task_id for task_id in task_ids if str(task_id) not in failed_ids}
+            self.logger.info(f"批量标记{len(succeeded)}个任务为已同步")
+            return succeeded
+        if self.bulk_mode == "auto":
+            self._bulk_supported = False
+            self.logger.info("任务中心不支持批量确认同步（响应缺少 updated/failed 字段），后续改为逐个标记")
+        return None
+
+    async def _mark_task_synced(self, task_id: str, headers: dict) -> bool:
+        async with self._mark_semaphore:
+            return await self._send_mark_synced(task_id, headers)
+
+    async def _send_mark_synced(self, task_id: str, headers: dict) -> bool:
         try:
             params = {
                 "type": "update",
@@ -110,14 +435,20 @@ class TaskSyncManager:
                 self.logger.debug(f"标记任务同步 - URL: {self.task_center_url}")
                 self.logger.debug(f"标记任务同步 - 请求参数: {params}")
                 self.logger.debug(f"标记任务同步 - 请求头: {headers}")
-            resp = await fetch_json(
+            status, _, resp = await fetch_json_with_meta(
                 self.task_center_url,
                 method="GET",
                 params=params,
                 headers=headers
             )
             if self.logger.should_log_detail():
-                self.logger.debug(f"标记任务同步 - 响应: {resp}")
+                self.logger.debug(f"标记任务同步 - 响应: {status} {resp}")
+            # fetch_json 不会因 HTTP 错误抛出异常，需检查状态码和响应体
+            check_update_response(status, resp)
             self.logger.info(f"任务 {task_id} 标记为已同步")
+            return True
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.logger.exception(f"标记任务同步失败 {task_id}: {e}")
+            return False
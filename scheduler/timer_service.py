@@ -0,0 +1,270 @@
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Set
+
+# 时间轮参数：每格 0.1 秒，每层 64 格，共 4 层（约 19 天），更远的定时器放入溢出列表
+TICK = 0.1
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4
+
+
+class TimerHandle:
+    """定时器句柄，cancel() 后回调不会再执行"""
+
+    __slots__ = ("deadline", "expire", "callback", "args", "cancelled", "_service")
+
+    def __init__(self, service: "TimerService", deadline: float, expire: int, callback: Callable, args: tuple):
+        self._service = service
+        self.deadline = deadline
+        self.expire = expire
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self._service._live -= 1
+
+
+class DailyTimer:
+    """每天固定本地时间执行的定时器，执行后自动注册下一天"""
+
+    def __init__(self, service: "TimerService", hour: int, minute: int, callback: Callable, args: tuple):
+        self._service = service
+        self.hour = hour
+        self.minute = minute
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.next_run: Optional[datetime] = None
+        self._handle: Optional[TimerHandle] = None
+        self._schedule()
+
+    def _schedule(self):
+        now = datetime.now()
+        target = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        self.next_run = target
+        self._handle = self._service.call_at(target.timestamp(), self._fire)
+
+    def _fire(self):
+        if self.cancelled:
+            return None
+        self._schedule()
+        return self.callback(*self.args)
+
+    def cancel(self):
+        self.cancelled = True
+        if self._handle:
+            self._handle.cancel()
+
+
+class TimerService:
+    """插件共享的定时器服务（分层时间轮）
+
+    各组件注册到期时间和回调（任务执行时间、待办到期时间、每日汇总时间），
+    服务只在最近的到期时间醒来，到期后执行回调；回调可以是普通函数或协程函数。
+    注册和取消均为 O(1)，精度为一格（0.1 秒）。
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._levels: List[List[List[TimerHandle]]] = [
+            [[] for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)
+        ]
+        self._overflow: List[TimerHandle] = []
+        self._ready: List[TimerHandle] = []
+        # 下一个待处理的格（绝对格号 = epoch 秒 / TICK）
+        self._tick = int(time.time() / TICK)
+        self._live = 0
+        self._wakeup = asyncio.Event()
+        self._sleep_until: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        self._stats = {"scheduled": 0, "fired": 0, "wakeups": 0, "errors": 0}
+
+    # ---------- 注册 ----------
+
+    def call_at(self, deadline: float, callback: Callable, *args: Any) -> TimerHandle:
+        """在 epoch 秒 deadline 时执行 callback(*args)"""
+        handle = TimerHandle(self, deadline, math.ceil(deadline / TICK), callback, args)
+        self._live += 1
+        self._stats["scheduled"] += 1
+        self._insert(handle)
+        # 比当前睡眠目标更早时唤醒驱动循环重新计算
+        if self._sleep_until is None or handle.expire < self._sleep_until:
+            self._wakeup.set()
+        return handle
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> TimerHandle:
+        return self.call_at(time.time() + delay, callback, *args)
+
+    def call_daily(self, hour: int, minute: int, callback: Callable, *args: Any) -> DailyTimer:
+        """每天本地时间 hour:minute 执行 callback(*args)"""
+        return DailyTimer(self, hour, minute, callback, args)
+
+    def _insert(self, handle: TimerHandle):
+        expire = handle.expire
+        delta = expire - self._tick
+        if delta < 0:
+            self._ready.append(handle)
+            return
+        for level in range(WHEEL_LEVELS):
+            if delta < 1 << (WHEEL_BITS * (level + 1)):
+                index = (expire >> (WHEEL_BITS * level)) & WHEEL_MASK
+                self._levels[level][index].append(handle)
+                return
+        self._overflow.append(handle)
+
+    # ---------- 推进时间轮 ----------
+
+    def _cascade(self, tick: int):
+        """到达第 0 层的整圈边界时，把上层对应格中的定时器重新放入更低的层"""
+        slots = []
+        for level in range(1, WHEEL_LEVELS):
+            index = (tick >> (WHEEL_BITS * level)) & WHEEL_MASK
+            slots.append((level, index))
+            if index != 0:
+                break
+        else:
+            # 最高层也转满一圈，溢出列表中的定时器重新放入
+            overflow, self._overflow = self._overflow, []
+            for handle in overflow:
+                if not handle.cancelled:
+                    self._insert(handle)
+        for level, index in reversed(slots):
+            entries = self._levels[level][index]
+            if entries:
+                self._levels[level][index] = []
+                for handle in entries:
+                    if not handle.cancelled:
+                        self._insert(handle)
+
+    def _level_empty(self, level: int) -> bool:
+        return not any(self._levels[level])
+
+    def _advance(self, target: int) -> List[TimerHandle]:
+        """推进到 target 格（含），返回到期的定时器"""
+        due, self._ready = self._ready, []
+        wheel0 = self._levels[0]
+        while self._tick <= target:
+            tick = self._tick
+            slot = wheel0[tick & WHEEL_MASK]
+            if slot:
+                wheel0[tick & WHEEL_MASK] = []
+                for handle in slot:
+                    if handle.cancelled:
+                        continue
+                    if handle.expire <= tick:
+                        due.append(handle)
+                    else:
+                        self._insert(handle)
+            # 跳过本圈内的空格
+            boundary = (tick | WHEEL_MASK) + 1
+            limit = min(boundary, target + 1)
+            nxt = tick + 1
+            while nxt < limit and not wheel0[nxt & WHEEL_MASK]:
+                nxt += 1
+            # 第 0 层为空时按整圈跳过第 1 层的空格
+            if nxt == boundary and self._level_empty(0):
+                wheel1 = self._levels[1]
+                while nxt + WHEEL_SIZE <= target and (nxt >> WHEEL_BITS) & WHEEL_MASK != 0 \
+                        and not wheel1[(nxt >> WHEEL_BITS) & WHEEL_MASK]:
+                    nxt += WHEEL_SIZE
+            self._tick = nxt
+            if nxt & WHEEL_MASK == 0:
+                self._cascade(nxt)
+        return due
+
+    def _next_expire(self) -> Optional[int]:
+        """最近的到期格号，没有定时器时返回 None"""
+        if self._ready:
+            return self._tick
+        best = None
+        for level in range(WHEEL_LEVELS):
+            shift = WHEEL_BITS * level
+            base = self._tick >> shift
+            start = 0 if level == 0 else 1
+            for offset in range(start, WHEEL_SIZE + start):
+                entries = self._levels[level][(base + offset) & WHEEL_MASK]
+                live = [h.expire for h in entries if not h.cancelled]
+                if live:
+                    candidate = min(live)
+                    best = candidate if best is None else min(best, candidate)
+                    break
+        live = [h.expire for h in self._overflow if not h.cancelled]
+        if live:
+            best = min(live) if best is None else min(best, min(live))
+        return best
+
+    # ---------- 驱动循环 ----------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._callbacks):
+            task.cancel()
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            expire = self._next_expire()
+            self._sleep_until = expire
+            timeout = None if expire is None else max(0.0, expire * TICK - time.time())
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._stats["wakeups"] += 1
+            # 计时精度误差导致稍早醒来时，按格号向下取整不会提前触发
+            for handle in self._advance(int(time.time() / TICK)):
+                self._fire(handle)
+
+    def _fire(self, handle: TimerHandle):
+        if handle.cancelled:
+            return
+        handle.cancelled = True
+        self._live -= 1
+        self._stats["fired"] += 1
+        try:
+            result = handle.callback(*handle.args)
+            if asyncio.iscoroutine(result):
+                task = asyncio.create_task(result)
+                self._callbacks.add(task)
+                task.add_done_callback(self._on_callback_done)
+        except Exception as e:
+            self._stats["errors"] += 1
+            self.logger.exception(f"定时器回调执行失败: {e}")
+
+    def _on_callback_done(self, task: asyncio.Task):
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["errors"] += 1
+            self.logger.error(f"定时器回调执行失败: {task.exception()}")
+
+    def get_stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["timers"] = self._live
+        expire = self._next_expire()
+        stats["next_fire_at"] = (
+            datetime.fromtimestamp(expire * TICK).strftime("%Y-%m-%d %H:%M:%S") if expire is not None else None
+        )
+        return stats
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+def to_epoch(value: Any, naive_as_local: bool = False, z_as_local: bool = False) -> Optional[float]:
+    """把时间值统一解析为 epoch 秒，无法解析时返回 None
+
+    - 数值视为 epoch 秒
+    - ISO 字符串：带 Z 或 ±HH:MM 偏移时按偏移换算；不带时区时按 UTC
+      （naive_as_local=True 时按本地时间）
+    - z_as_local=True 时末尾的 Z 不代表 UTC，而按本地时间处理
+      （旧版待办把本地时间加 Z 保存）
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    time_str = value.strip()
+    if time_str.endswith(("Z", "z")):
+        time_str = time_str[:-1]
+        if not z_as_local:
+            time_str += "+00:00"
+    try:
+        dt = datetime.fromisoformat(time_str)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        if naive_as_local or z_as_local:
+            return dt.timestamp()
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def cached_epoch(record: Dict[str, Any], field: str, naive_as_local: bool = False,
+                 z_as_local: bool = False) -> Optional[float]:
+    """读取记录中 field 对应的 epoch 秒，首次解析后缓存到 record[f"{field}_ts"]
+
+    缓存随记录一起保存，之后的调度比较直接使用数值，不再解析字符串。
+    """
+    cache_key = f"{field}_ts"
+    cached = record.get(cache_key)
+    if isinstance(cached, (int, float)) and not isinstance(cached, bool):
+        return float(cached)
+    epoch = to_epoch(record.get(field), naive_as_local=naive_as_local, z_as_local=z_as_local)
+    if epoch is not None:
+        record[cache_key] = epoch
+    return epoch
+
+
+def todo_due_epoch(todo: Dict[str, Any]) -> Optional[float]:
+    """待办预计完成时间的 epoch 秒（带缓存）
+
+    新待办保存为带本地偏移的 ISO 时间；旧待办是本地时间加 Z，按本地时间解析。
+    """
+    return cached_epoch(todo, "estimated_finish_time", naive_as_local=True, z_as_local=True)
+
+
+def format_local(epoch: Optional[float], fmt: str = "%m-%d %H:%M") -> str:
+    """按本地时区格式化 epoch 秒，None 返回空字符串"""
+    if epoch is None:
+        return ""
+    return datetime.fromtimestamp(epoch).strftime(fmt)
@@ -1,16 +1,18 @@
 """
 待办提醒定时任务
-每日8点和14点提醒用户当前进行中的待办
+每日8点和14点提醒用户当前进行中的待办，待办到达预计完成时间时发送到期提醒
 """
-import asyncio
-from datetime import datetime, time
-from typing import Any
+from datetime import datetime
+from typing import Any, Dict, List
+
+from ..todos.todo_manager import TodoManager
+from .timestamps import format_local, todo_due_epoch
 
 
 class TodoReminderTask:
     """待办提醒定时任务"""
     
-    def __init__(self, todo_manager, users_manager, context, logger):
+    def __init__(self, todo_manager, users_manager, context, logger, timer_service):
         """
         初始化提醒任务
         
@@ -19,13 +21,28 @@ class TodoReminderTask:
             users_manager: 用户管理器
             context: AstrBot上下文
             logger: 日志记录器
+            timer_service: 共享定时器服务
         """
         self.todo_manager = todo_manager
         self.users_manager = users_manager
         self.context = context
         self.logger = logger
+        self.timer_service = timer_service
         self.running = False
-        self.task = None
+        # 每日提醒定时器，以及每个用户的到期提醒定时器
+        self._daily_timers = []
+        self._due_timers: Dict[str, List[Any]] = {}
+    
+    @staticmethod
+    def _format_due(todo: dict) -> str:
+        """待办预计完成时间的显示文本（本地时间）"""
+        est_time = todo.get("estimated_finish_time", "")
+        if not est_time:
+            return ""
+        due_ts = todo_due_epoch(todo)
+        if due_ts is None:
+            return str(est_time)[:16]
+        return format_local(due_ts)
     
     async def _send_reminder(self, user_id: str, todos: list, reminder_type: str = "daily"):
         """
@@ -62,15 +79,7 @@ class TodoReminderTask:
                 for todo in todos:
                     display_id = todo.get("display_id", 0)
                     content = todo.get("content", "")
-                    est_time = todo.get("estimated_finish_time", "")
-                    
-                    time_str = ""
-                    if est_time:
-                        try:
-                            dt = datetime.fromisoformat(est_time.replace("Z", "+00:00"))
-                            time_str = dt.strftime("%m-%d %H:%M")
-                        except:
-                            time_str = est_time[:16]
+                    time_str = self._format_due(todo)
                     
                     msg_lines.append(f"⚠️ 序号 {display_id}: {content}")
                     if time_str:
@@ -80,7 +89,7 @@ class TodoReminderTask:
                 reminder_msg = "\n".join(msg_lines)
             else:
                 # 定时提醒：详细分类格式
-                now = datetime.now()
+                now_ts = datetime.now().timestamp()
                 overdue_todos = []  # 已到期
                 soon_todos = []     # 2小时内到期
                 today_todos = []    # 1天内到期
@@ -92,33 +101,27 @@ class TodoReminderTask:
                         normal_todos.append(todo)
                         continue
                     
-                    try:
-                        # 解析预计完成时间（与到期检查保持一致）
-                        if isinstance(est_time, str):
-                            time_str = est_time.rstrip("Z")
-                            if "+" in time_str:
-                                time_str = time_str.split("+")[0]
-                            dt = datetime.fromisoformat(time_str)
-                        else:
-                            dt = datetime.fromtimestamp(est_time)
-                        
-                        # 计算到期时间差（秒）
-                        diff = (dt - now).total_seconds()
-                        
-                        if diff < 0:
-                            # 已到期
-                            overdue_todos.append(todo)
-                        elif diff < 7200:  # 2小时 = 7200秒
-                            # 即将到期
-                            soon_todos.append(todo)
-                        elif diff < 86400:  # 24小时 = 86400秒
-                            # 1天内到期
-                            today_todos.append(todo)
-                        else:
-                            # 正常待办
-                            normal_todos.append(todo)
-                    except Exception as parse_e:
-                        self.logger.debug(f"无法解析待办时间: {est_time} - {parse_e}")
+                    # 预计完成时间（epoch 秒，解析一次后缓存在待办上，与到期检查一致）
+                    due_ts = todo_due_epoch(todo)
+                    if due_ts is None:
+                        self.logger.debug(f"无法解析待办时间: {est_time}")
+                        normal_todos.append(todo)
+                        continue
+                    
+                    # 计算到期时间差（秒）
+                    diff = due_ts - now_ts
+                    
+                    if diff < 0:
+                        # 已到期
+                        overdue_todos.append(todo)
+                    elif diff < 7200:  # 2小时 = 7200秒
+                        # 即将到期
+                        soon_todos.append(todo)
+                    elif diff < 86400:  # 24小时 = 86400秒
+                        # 1天内到期
+                        today_todos.append(todo)
+                    else:
+                        # 正常待办
                         normal_todos.append(todo)
                 
                 msg_lines = [f"⏰ 待办提醒 ({len(todos)}个进行中):\n"]
@@ -128,16 +131,9 @@ class TodoReminderTask:
                 for todo in overdue_todos:
                     display_id = todo.get("display_id", 0)
                     content = todo.get("content", "")
-                    est_time = todo.get("estimated_finish_time", "")
                     follow_ups = todo.get("follow_ups", [])
                     
-                    time_str = ""
-                    if est_time:
-                        try:
-                            dt = datetime.fromisoformat(est_time.replace("Z", "+00:00"))
-                            time_str = dt.strftime("%m-%d %H:%M")
-                        except:
-                            time_str = est_time[:16]
+                    time_str = self._format_due(todo)
                     
                     todo_line = f"  {display_id}. {content}"
                     if time_str:
@@ -154,16 +150,9 @@ class TodoReminderTask:
                 for todo in soon_todos:
                     display_id = todo.get("display_id", 0)
                     content = todo.get("content", "")
-                    est_time = todo.get("estimated_finish_time", "")
                     follow_ups = todo.get("follow_ups", [])
                     
-                    time_str = ""
-                    if est_time:
-                        try:
-                            dt = datetime.fromisoformat(est_time.replace("Z", "+00:00"))
-                            time_str = dt.strftime("%m-%d %H:%M")
-                        except:
-                            time_str = est_time[:16]
+                    time_str = self._format_due(todo)
                     
                     todo_line = f"  {display_id}. {content}"
                     if time_str:
@@ -180,16 +169,9 @@ class TodoReminderTask:
                 for todo in today_todos:
                     display_id = todo.get("display_id", 0)
                     content = todo.get("content", "")
-                    est_time = todo.get("estimated_finish_time", "")
                     follow_ups = todo.get("follow_ups", [])
                     
-                    time_str = ""
-                    if est_time:
-                        try:
-                            dt = datetime.fromisoformat(est_time.replace("Z", "+00:00"))
-                            time_str = dt.strftime("%m-%d %H:%M")
-                        except:
-                            time_str = est_time[:16]
+                    time_str = self._format_due(todo)
                     
                     todo_line = f"  {display_id}. {content}"
                     if time_str:
@@ -206,16 +188,9 @@ class TodoReminderTask:
                 for todo in normal_todos:
                     display_id = todo.get("display_id", 0)
                     content = todo.get("content", "")
-                    est_time = todo.get("estimated_finish_time", "")
                     follow_ups = todo.get("follow_ups", [])
                     
-                    time_str = ""
-                    if est_time:
-                        try:
-                            dt = datetime.fromisoformat(est_time.replace("Z", "+00:00"))
-                            time_str = dt.strftime("%m-%d %H:%M")
-                        except:
-                            time_str = est_time[:16]
+                    time_str = self._format_due(todo)
                     
                     todo_line = f"  {display_id}. {content}"
                     if time_str:
@@ -284,129 +259,129 @@ class TodoReminderTask:
         except Exception as e:
             self.logger.exception(f"执行待办提醒失败: {e}")
     
-    async def _check_due_todos(self):
-        """检查到期待办并发送提醒"""
+    def _user_ids(self) -> List[str]:
+        import os
+        user_data_dir = self.users_manager.user_data_dir
+        if not os.path.exists(user_data_dir):
+            return []
+        return [
+            user_folder for user_folder in os.listdir(user_data_dir)
+            if user_folder.startswith("u_") and self.users_manager.user_exists(user_folder)
+        ]
+    
+    def _schedule_all_due(self):
+        """启动时为所有用户的进行中待办注册到期定时器"""
+        try:
+            for user_id in self._user_ids():
+                todos_data = self.todo_manager._load_todos(user_id)
+                # 旧待办首次解析时间后写回缓存（保存会触发变化回调并注册定时器）
+                uncached = any(
+                    todo.get("estimated_finish_time") and "estimated_finish_time_ts" not in todo
+                    for todo in todos_data.get("todos", [])
+                )
+                self._schedule_user_todos(user_id, todos_data)
+                if uncached:
+                    self.todo_manager._save_todos(user_id, todos_data)
+        except Exception as e:
+            self.logger.exception(f"注册待办到期提醒失败: {e}")
+    
+    def _on_todos_changed(self, user_id: str, todos_data: dict):
+        """待办保存后的回调：重新注册该用户的到期定时器"""
+        if self.running:
+            self._schedule_user_todos(user_id, todos_data)
+    
+    def _schedule_user_todos(self, user_id: str, todos_data: dict):
+        """为一个用户进行中且未提醒的待办注册到期定时器（同一时间只注册一个）"""
+        for handle in self._due_timers.pop(user_id, []):
+            handle.cancel()
+        now_ts = datetime.now().timestamp()
+        due_times = set()
+        for todo in todos_data.get("todos", []):
+            if todo.get("status") != "进行中" or todo.get("due_reminded", False):
+                continue
+            due_ts = todo_due_epoch(todo)
+            # 超过到期后5分钟的不再提醒（与原到期检查窗口一致）
+            if due_ts is None or now_ts - due_ts > 300:
+                continue
+            due_times.add(max(due_ts, now_ts))
+        if due_times:
+            self._due_timers[user_id] = [
+                self.timer_service.call_at(due_ts, self._check_due_todos, user_id) for due_ts in sorted(due_times)
+            ]
+    
+    async def _check_due_todos(self, user_id: str):
+        """定时器回调：发送该用户已到期（到期后5分钟内）且未提醒过的待办"""
         try:
-            import os
-            user_data_dir = self.users_manager.user_data_dir
-            if not os.path.exists(user_data_dir):
-                return
-            
             now = datetime.now()
+            now_ts = now.timestamp()
             self.logger.debug(f"[到期检查] 当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # 遍历所有用户
-            for user_folder in os.listdir(user_data_dir):
-                if not user_folder.startswith("u_"):
+            # 加载待办数据
+            todos_data = self.todo_manager._load_todos(user_id)
+            todos = todos_data.get("todos", [])
+            
+            # 查找到期且未发送过到期提醒的待办
+            due_todos = []
+            
+            for todo in todos:
+                if todo.get("status") != "进行中":
                     continue
                 
-                user_id = user_folder
-                
-                # 检查用户是否存在
-                if not self.users_manager.user_exists(user_id):
+                # 检查是否已发送过到期提醒
+                if todo.get("due_reminded", False):
                     continue
                 
-                # 加载待办数据
-                todos_data = self.todo_manager._load_todos(user_id)
-                todos = todos_data.get("todos", [])
+                # 预计完成时间（epoch 秒，解析一次后缓存在待办上）
+                due_ts = todo_due_epoch(todo)
+                if due_ts is None:
+                    continue
                 
-                # 查找到期且未发送过到期提醒的待办
-                due_todos = []
+                # 计算时间差（秒）
+                diff = now_ts - due_ts
                 
-                for todo in todos:
-                    if todo.get("status") != "进行中":
-                        continue
-                    
-                    est_time = todo.get("estimated_finish_time", "")
-                    if not est_time:
-                        continue
-                    
-                    # 检查是否已发送过到期提醒
-                    if todo.get("due_reminded", False):
-                        continue
-                    
-                    try:
-                        # 解析预计完成时间（参考 TaskManager 的时间解析逻辑）
-                        if isinstance(est_time, str):
-                            # 移除末尾的 Z 和时区信息
-                            time_str = est_time.rstrip("Z")
-                            if "+" in time_str:
-                                time_str = time_str.split("+")[0]
-                            dt = datetime.fromisoformat(time_str)
-                        else:
-                            dt = datetime.fromtimestamp(est_time)
-                        
-                        # 计算时间差（秒）
-                        diff = (now - dt).total_seconds()
-                        
-                        # 在到期时间后0-5分钟内发送提醒
-                        if 0 <= diff <= 300:  # 5分钟 = 300秒
-                            due_todos.append(todo)
-                            # 标记为已提醒
-                            todo["due_reminded"] = True
-                            self.logger.info(f"待办已到期: {todo.get('display_id')} - {todo.get('content')} (差异: {diff}秒)")
-                    except Exception as parse_e:
-                        self.logger.debug(f"无法解析待办时间: {est_time} - {parse_e}")
-                        continue
+                # 在到期时间后0-5分钟内发送提醒
+                if 0 <= diff <= 300:  # 5分钟 = 300秒
+                    due_todos.append(todo)
+                    # 标记为已提醒
+                    todo["due_reminded"] = True
+                    self.logger.info(f"待办已到期: {todo.get('display_id')} - {todo.get('content')} (差异: {diff:.1f}秒)")
+            
+            # 发送到期提醒
+            if due_todos:
+                self.logger.info(f"发现 {len(due_todos)} 个到期待办: {user_id}")
+                await self._send_reminder(user_id, due_todos, reminder_type="due")
+                # 保存更新
+                self.todo_manager._save_todos(user_id, todos_data)
                 
-                # 发送到期提醒
-                if due_todos:
-                    self.logger.info(f"发现 {len(due_todos)} 个到期待办: {user_id}")
-                    await self._send_reminder(user_id, due_todos, reminder_type="due")
-                    # 保存更新
-                    self.todo_manager._save_todos(user_id, todos_data)
-                    
         except Exception as e:
             self.logger.exception(f"检查到期待办失败: {e}")
     
-    async def _schedule_loop(self):
-        """定时任务循环"""
-        self.logger.info("待办提醒任务已启动")
-        
-        while self.running:
-            try:
-                now = datetime.now()
-                current_time = now.time()
-                
-                # 检查是否为定时提醒时间（8:00 或 14:00）
-                morning_reminder = time(8, 0)
-                afternoon_reminder = time(14, 0)
-                
-                # 允许1分钟的时间窗口
-                is_morning = (
-                    current_time.hour == 8 and 
-                    current_time.minute < 1
-                )
-                is_afternoon = (
-                    current_time.hour == 14 and 
-                    current_time.minute < 1
-                )
-                
-                if is_morning or is_afternoon:
-                    self.logger.info("开始执行定时待办提醒...")
-                    await self._run_reminder()
-                    # 等待1分钟，避免重复提醒
-                    await asyncio.sleep(60)
-                else:
-                    # 每分钟检查一次到期待办
-                    await self._check_due_todos()
-                    await asyncio.sleep(60)
-                    
-            except Exception as e:
-                self.logger.exception(f"待办提醒任务异常: {e}")
-                await asyncio.sleep(60)
-    
     def start(self):
-        """启动提醒任务"""
+        """启动提醒任务：注册每日8点、14点提醒和所有待办的到期提醒"""
         if not self.running:
             self.running = True
-            self.task = asyncio.create_task(self._schedule_loop())
+            self._daily_timers = [
+                self.timer_service.call_daily(8, 0, self._run_daily_reminder),
+                self.timer_service.call_daily(14, 0, self._run_daily_reminder),
+            ]
+            TodoManager.add_change_listener(self._on_todos_changed)
+            self._schedule_all_due()
             self.logger.info("待办提醒任务已创建")
     
+    async def _run_daily_reminder(self):
+        self.logger.info("开始执行定时待办提醒...")
+        await self._run_reminder()
+    
     def stop(self):
         """停止提醒任务"""
         if self.running:
             self.running = False
-            if self.task:
-                self.task.cancel()
+            TodoManager.remove_change_listener(self._on_todos_changed)
+            for timer in self._daily_timers:
+                timer.cancel()
+            self._daily_timers = []
+            for handles in self._due_timers.values():
+                for handle in handles:
+                    handle.cancel()
+            self._due_timers.clear()
             self.logger.info("待办提醒任务已停止")
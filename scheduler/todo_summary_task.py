@@ -3,15 +3,14 @@
 总结用户今日待办进展，以Markdown格式发送给用户
 """
 import os
-import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List
 
 
 class TodoSummaryTask:
     """每日待办总结任务"""
     
-    def __init__(self, todo_manager, users_manager, context, logger):
+    def __init__(self, todo_manager, users_manager, context, logger, timer_service):
         """
         初始化待办总结任务
         
@@ -20,13 +19,15 @@ class TodoSummaryTask:
             users_manager: 用户管理器
             context: AstrBot上下文
             logger: 日志记录器
+            timer_service: 共享定时器服务
         """
         self.todo_manager = todo_manager
         self.users_manager = users_manager
         self.context = context
         self.logger = logger
+        self.timer_service = timer_service
         self.is_running = False
-        self.task = None
+        self.timer = None
     
     def _generate_todo_summary(self, user_id: str, date_str: str = None) -> str:
         """
@@ -268,42 +269,12 @@ class TodoSummaryTask:
         except Exception as e:
             self.logger.exception(f"生成每日待办总结失败: {e}")
     
-    async def _schedule_task(self, hour: int = 22, minute: int = 30):
-        """
-        定时任务调度器
-        
-        Args:
-            hour: 执行小时 (0-23)
-            minute: 执行分钟 (0-59)
-        """
-        while self.is_running:
-            try:
-                now = datetime.now()
-                target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                
-                # 如果目标时间已过，设置为明天
-                if now >= target_time:
-                    target_time += timedelta(days=1)
-                
-                # 计算等待时间
-                wait_seconds = (target_time - now).total_seconds()
-                
-                self.logger.info(f"待办总结任务将在 {target_time.strftime('%Y-%m-%d %H:%M:%S')} 执行")
-                
-                # 等待到目标时间
-                await asyncio.sleep(wait_seconds)
-                
-                # 执行总结任务
-                if self.is_running:
-                    self.logger.info("开始执行每日待办总结任务")
-                    await self._generate_daily_summaries()
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                self.logger.exception(f"定时任务执行失败: {e}")
-                # 出错后等待1小时再重试
-                await asyncio.sleep(3600)
+    async def _run_scheduled(self):
+        """定时器回调：执行每日待办总结"""
+        if not self.is_running:
+            return
+        self.logger.info("开始执行每日待办总结任务")
+        await self._generate_daily_summaries()
     
     async def start(self, hour: int = 22, minute: int = 30):
         """
@@ -318,7 +289,9 @@ class TodoSummaryTask:
             return
         
         self.is_running = True
-        self.task = asyncio.create_task(self._schedule_task(hour, minute))
+        # 由共享定时器服务在每天的目标时间唤醒，不再常驻睡眠循环
+        self.timer = self.timer_service.call_daily(hour, minute, self._run_scheduled)
+        self.logger.info(f"待办总结任务将在 {self.timer.next_run.strftime('%Y-%m-%d %H:%M:%S')} 执行")
         self.logger.info(f"待办总结任务已启动，每天 {hour:02d}:{minute:02d} 执行")
     
     async def stop(self):
@@ -327,11 +300,8 @@ class TodoSummaryTask:
             return
         
         self.is_running = False
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
         
         self.logger.info("待办总结任务已停止")
@@ -0,0 +1,196 @@
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .cache_utils import CacheUtils
+from .file_io import file_io
+
+MB = 1024 * 1024
+CACHE_TYPES = ("image", "voice", "video", "file")
+
+
+class CacheManager:
+    """富媒体缓存容量管理
+
+    按类型和总量限制缓存目录大小，超出时按访问时间（lru）或访问次数（lfu）淘汰文件。
+    后台由共享定时器周期清理；最近访问过的文件（min_age 秒内）和待执行主动消息任务引用的
+    文件不会被淘汰。
+
+    Args:
+        cache_utils: 共享的缓存工具（提供索引）
+        max_total_mb: 缓存总大小上限，0 表示不限
+        type_max_mb: 各类型大小上限，如 {"video": 1024}，0 或缺省表示不限
+        policy: 淘汰策略，lru 或 lfu
+        sweep_interval: 后台清理间隔（秒）
+        min_age: 最近访问多少秒内的文件不淘汰（正在发送的文件）
+        protected_sources: 返回需要保护的资源（URL）列表的回调
+    """
+
+    def __init__(self, cache_utils: CacheUtils, logger, timer_service, max_total_mb: float = 2048,
+                 type_max_mb: Optional[Dict[str, float]] = None, policy: str = "lru",
+                 sweep_interval: float = 600, min_age: float = 300,
+                 protected_sources: Optional[Callable[[], Iterable[str]]] = None):
+        self.cache_utils = cache_utils
+        self.logger = logger
+        self.timer_service = timer_service
+        self.max_total_bytes = int(max_total_mb * MB) if max_total_mb else 0
+        self.type_max_bytes = {t: int(mb * MB) for t, mb in (type_max_mb or {}).items() if mb}
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.sweep_interval = max(10, sweep_interval)
+        self.min_age = max(0, min_age)
+        self.protected_sources = protected_sources
+        self._timer = None
+        self._stats = {
+            "sweeps": 0,
+            "evicted_files": 0,
+            "evicted_bytes": 0,
+            "last_sweep_at": None,
+            "files": 0,
+            "total_bytes": 0,
+            "bytes_by_type": {},
+        }
+
+    def start(self):
+        # 启动后稍等片刻先清理一次，之后按间隔周期清理
+        self._timer = self.timer_service.call_later(min(30, self.sweep_interval), self._on_timer)
+
+    async def stop(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.cache_utils.save_index()
+
+    async def _on_timer(self):
+        try:
+            await self.sweep()
+        except Exception as e:
+            self.logger.exception(f"清理媒体缓存失败: {e}")
+        finally:
+            if self._timer is not None:
+                self._timer = self.timer_service.call_later(self.sweep_interval, self._on_timer)
+
+    def _protected_paths(self) -> set:
+        paths = set()
+        if self.protected_sources is None:
+            return paths
+        try:
+            for source in self.protected_sources():
+                path = self.cache_utils.cached_path(source)
+                if path:
+                    paths.add(os.path.normpath(path))
+        except Exception as e:
+            self.logger.warning(f"获取待执行任务引用的缓存文件失败: {e}")
+        return paths
+
+    async def _scan(self) -> List[dict]:
+        """列出缓存文件，访问时间优先取索引记录，没有索引的旧文件取修改时间"""
+        indexed = self.cache_utils.index_entries()
+        files = await file_io.run(_list_cache_files, self.cache_utils.cache_dir)
+        for f in files:
+            entry = indexed.get(f"{f['type']}/{os.path.basename(f['path'])}", {})
+            f["last_access"] = entry.get("last_access") or entry.get("created_at") or f["mtime"]
+            f["hits"] = entry.get("hits", 0)
+            f["key"] = entry.get("key")
+        return files
+
+    def _order(self, files: List[dict]) -> List[dict]:
+        if self.policy == "lfu":
+            return sorted(files, key=lambda f: (f["hits"], f["last_access"]))
+        return sorted(files, key=lambda f: f["last_access"])
+
+    async def sweep(self) -> dict:
+        """执行一次清理，返回本次淘汰的文件数和字节数"""
+        now = time.time()
+        files = await self._scan()
+        protected = self._protected_paths()
+        evictable = [
+            f for f in files
+            if os.path.normpath(f["path"]) not in protected and now - f["last_access"] >= self.min_age
+        ]
+        sizes: Dict[str, int] = {}
+        for f in files:
+            sizes[f["type"]] = sizes.get(f["type"], 0) + f["size"]
+        total = sum(sizes.values())
+
+        victims = []
+        # 先按类型上限淘汰，再按总量上限淘汰
+        for media_type, limit in self.type_max_bytes.items():
+            if sizes.get(media_type, 0) <= limit:
+                continue
+            for f in self._order([f for f in evictable if f["type"] == media_type]):
+                if sizes[media_type] <= limit:
+                    break
+                victims.append(f)
+                sizes[media_type] -= f["size"]
+                total -= f["size"]
+        if self.max_total_bytes and total > self.max_total_bytes:
+            chosen = {id(f) for f in victims}
+            for f in self._order([f for f in evictable if id(f) not in chosen]):
+                if total <= self.max_total_bytes:
+                    break
+                victims.append(f)
+                sizes[f["type"]] -= f["size"]
+                total -= f["size"]
+
+        evicted_files = evicted_bytes = 0
+        forgotten = []
+        errors = await file_io.run(_remove_files, [f["path"] for f in victims])
+        for f in victims:
+            if f["path"] in errors:
+                self.logger.warning(f"删除缓存文件失败 {f['path']}: {errors[f['path']]}")
+                sizes[f["type"]] += f["size"]
+                total += f["size"]
+                continue
+            evicted_files += 1
+            evicted_bytes += f["size"]
+            if f["key"]:
+                forgotten.append(f["key"])
+        self.cache_utils.forget(forgotten)
+        await self.cache_utils.save_index()
+
+        self._stats["sweeps"] += 1
+        self._stats["evicted_files"] += evicted_files
+        self._stats["evicted_bytes"] += evicted_bytes
+        self._stats["last_sweep_at"] = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        self._stats["files"] = len(files) - evicted_files
+        self._stats["total_bytes"] = total
+        self._stats["bytes_by_type"] = sizes
+        if evicted_files:
+            self.logger.info(f"媒体缓存清理: 淘汰{evicted_files}个文件，释放{evicted_bytes / MB:.1f}MB，当前{total / MB:.1f}MB")
+        return {"evicted_files": evicted_files, "evicted_bytes": evicted_bytes}
+
+    def get_stats(self) -> dict:
+        return dict(self._stats, policy=self.policy, cache=self.cache_utils.get_stats())
+
+
+def _list_cache_files(cache_dir: str) -> List[dict]:
+    """遍历各类型缓存目录（在线程池中调用）"""
+    files = []
+    for media_type in CACHE_TYPES:
+        type_dir = os.path.join(cache_dir, media_type)
+        if not os.path.isdir(type_dir):
+            continue
+        with os.scandir(type_dir) as it:
+            for item in it:
+                if not item.is_file() or item.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                files.append({"path": item.path, "type": media_type, "size": st.st_size, "mtime": st.st_mtime})
+    return files
+
+
+def _remove_files(paths: List[str]) -> Dict[str, str]:
+    """删除文件（在线程池中调用），返回删除失败的 路径 → 错误"""
+    errors = {}
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            errors[path] = str(e)
+    return errors
@@ -1,13 +1,53 @@
 import os
+import json
+import time
+import asyncio
+import re
 import base64
-from datetime import datetime
-from typing import Optional
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from .file_io import file_io
+from .journal import atomic_write_json
+
+# 流式下载每次读取的块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# base64 增量解码每次处理的字符数（4 的倍数，解码后约 768KB）
+BASE64_CHUNK_CHARS = 1024 * 1024
+# base64 类型判断只检查首尾各这么多字符
+BASE64_PROBE_CHARS = 64
+# 按行折叠的 base64（MIME 每行 76、PEM 每行 64 个字符）检查首尾各这么多字符内的行长
+BASE64_WRAP_PROBE_CHARS = 2 * (76 + 2)
+_BASE64_BODY = re.compile(r"[A-Za-z0-9+/]*")
+_LINE_BREAK = re.compile(r"\r?\n")
+# 分块解码时 \r\n 可能被块边界拆开，按字符去掉
+_LINE_BREAK_CHARS = re.compile(r"[\r\n]+")
+
 
 class CacheUtils:
-    def __init__(self, data_dir: str):
+    """富媒体缓存
+
+    文件按内容寻址：URL 资源以 URL 的 sha256 为键，base64 资源以解码后内容的 sha256 命名，
+    相同资源只下载 / 写入一次。cache/index.json 记录 键 → 缓存文件（相对路径），命中且文件
+    仍存在时直接返回已有路径。
+    """
+
+    def __init__(self, data_dir: str, max_download_mb: float = 200, download_timeout: float = 300):
         # 缓存存储在数据目录
         self.cache_dir = os.path.join(data_dir, "cache")
+        # 单个下载的大小上限（0 表示不限）和总超时
+        self.max_download_bytes = int(max_download_mb * 1024 * 1024) if max_download_mb else 0
+        self.download_timeout = download_timeout
+        self.index_path = os.path.join(self.cache_dir, "index.json")
         self._init_cache_dirs()
+        self._index: Dict[str, dict] = self._load_index()
+        # 索引变化只标记，由 save_index() 在线程池中合并落盘
+        self._index_dirty = False
+        self._index_lock = asyncio.Lock()
+        # 同一资源的并发请求只处理一次
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"hits": 0, "misses": 0}
 
     def _init_cache_dirs(self):
         cache_types = ["image", "voice", "video", "file"]
@@ -15,63 +55,236 @@ class CacheUtils:
             type_dir = os.path.join(self.cache_dir, cache_type)
             os.makedirs(type_dir, exist_ok=True)
 
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except Exception:
+            pass
+        return {}
+
+    async def save_index(self):
+        """在线程池中写回索引文件；并发调用时合并为一次写入"""
+        async with self._index_lock:
+            if not self._index_dirty:
+                return
+            # 在事件循环中复制一份，线程池只负责序列化和写文件
+            snapshot = {key: dict(entry) for key, entry in self._index.items()}
+            self._index_dirty = False
+            try:
+                await file_io.run(atomic_write_json, self.index_path, snapshot, None)
+            except Exception:
+                self._index_dirty = True
+
+    @staticmethod
+    def _hash_key(kind: str, value) -> str:
+        data = value.encode("utf-8") if isinstance(value, str) else value
+        return f"{kind}:{hashlib.sha256(data).hexdigest()}"
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """索引命中且文件仍存在时返回绝对路径"""
+        entry = self._index.get(key)
+        if not entry:
+            return None
+        file_path = os.path.join(self.cache_dir, entry["path"])
+        if os.path.exists(file_path):
+            self._touch(entry)
+            return file_path
+        # 文件已被删除，丢弃失效的索引项
+        self._index.pop(key, None)
+        self._index_dirty = True
+        return None
+
+    def _touch(self, entry: dict):
+        entry["last_access"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        self._index_dirty = True
+
+    def _remember(self, key: str, file_path: str, size: int):
+        now = time.time()
+        self._index[key] = {
+            "path": os.path.relpath(file_path, self.cache_dir).replace(os.sep, "/"),
+            "size": size,
+            "created_at": now,
+            "last_access": now,
+            "hits": 0,
+        }
+        self._index_dirty = True
+
+    def cached_path(self, source: str) -> Optional[str]:
+        """URL 资源已缓存时返回缓存文件路径（不计为访问）"""
+        if not isinstance(source, str) or not source.startswith(("http://", "https://")):
+            return None
+        entry = self._index.get(self._hash_key("url", source))
+        return os.path.join(self.cache_dir, entry["path"]) if entry else None
+
+    def index_entries(self) -> Dict[str, dict]:
+        """缓存文件相对路径 → 索引项（含键），供缓存清理使用"""
+        return {entry["path"]: dict(entry, key=key) for key, entry in self._index.items()}
+
+    def forget(self, keys):
+        """删除索引项（缓存文件已被清理）"""
+        for key in keys:
+            if self._index.pop(key, None) is not None:
+                self._index_dirty = True
+
     async def cache_media(self, source: str, media_type: str) -> str:
         try:
             cache_dir = os.path.join(self.cache_dir, media_type)
             os.makedirs(cache_dir, exist_ok=True)
             if isinstance(source, str) and (source.startswith("http://") or source.startswith("https://")):
-                return await self._download_and_save(source, cache_dir, media_type)
+                key = self._hash_key("url", source)
+                file_path = await self._cached(key, self._download_and_save(source, cache_dir, media_type, key))
             elif isinstance(source, str) and (source.startswith("data:") or self._is_base64(source)):
-                return await self._decode_and_save_base64(source, cache_dir, media_type)
+                file_path = await self._decode_and_save_base64(source, cache_dir, media_type)
             else:
                 return source
+            await self.save_index()
+            return file_path
         except Exception:
             return source
 
-    async def _download_and_save(self, url: str, cache_dir: str, media_type: str) -> str:
+    async def _cached(self, key: str, produce) -> str:
+        """命中索引时返回已有文件；同一键的并发请求等待第一个请求的结果"""
+        cached = self._lookup(key)
+        if cached:
+            produce.close()
+            self._stats["hits"] += 1
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            produce.close()
+            self._stats["hits"] += 1
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=30) as resp:
-                    if resp.status == 200:
-                        content = await resp.read()
-                        content_type = resp.headers.get("content-type", "")
-                        ext = self._get_extension_from_content_type(content_type, media_type)
-                        filename = f"{datetime.utcnow().timestamp()}{ext}"
-                        file_path = os.path.join(cache_dir, filename)
-                        with open(file_path, "wb") as f:
-                            f.write(content)
-                        return file_path
-                    else:
-                        raise Exception(f"下载失败: HTTP {resp.status}")
-        except Exception as e:
+            self._stats["misses"] += 1
+            file_path = await produce
+            future.set_result(file_path)
+            return file_path
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
             raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _download_and_save(self, url: str, cache_dir: str, media_type: str, key: str) -> str:
+        """按块流式写入临时文件，完成后原子改名；超过大小上限时提前中止"""
+        import aiohttp
+        from ..api.request import http_session
+        session = http_session.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.download_timeout, sock_read=30)
+        async with session.get(url, timeout=timeout) as resp:
+            if resp.status != 200:
+                raise Exception(f"下载失败: HTTP {resp.status}")
+            max_bytes = self.max_download_bytes
+            if max_bytes and resp.content_length is not None and resp.content_length > max_bytes:
+                raise Exception(f"文件过大: {resp.content_length} 字节，上限 {max_bytes} 字节")
+            content_type = resp.headers.get("content-type", "")
+            ext = self._get_extension_from_content_type(content_type, media_type)
+            file_path = os.path.join(cache_dir, f"{key.split(':', 1)[1]}{ext}")
+            tmp_path = f"{file_path}.tmp"
+            received = 0
+            # 打开、写入、改名都在文件线程池中执行，事件循环只负责收数据
+            f = await file_io.run(open, tmp_path, "wb")
+            try:
+                try:
+                    async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        received += len(chunk)
+                        if max_bytes and received > max_bytes:
+                            raise Exception(f"文件过大: 超过上限 {max_bytes} 字节")
+                        await file_io.run(f.write, chunk)
+                finally:
+                    await file_io.run(f.close)
+                await file_io.run(os.replace, tmp_path, file_path)
+            except BaseException:
+                await file_io.run(_remove_quietly, tmp_path)
+                raise
+        self._remember(key, file_path, received)
+        return file_path
 
     async def _decode_and_save_base64(self, content: str, cache_dir: str, media_type: str) -> str:
-        try:
-            if content.startswith("data:"):
-                content = content.split(",", 1)[1]
-            decoded = base64.b64decode(content)
-            ext = self._get_extension_by_type(media_type)
-            filename = f"{datetime.utcnow().timestamp()}{ext}"
-            file_path = os.path.join(cache_dir, filename)
-            with open(file_path, "wb") as f:
-                f.write(decoded)
-            return file_path
-        except Exception:
-            raise
+        # data URI 只记录数据起始位置，不复制整个字符串
+        start = content.index(",") + 1 if content.startswith("data:") else 0
+        ext = self._get_extension_by_type(media_type)
+        # 分块解码、哈希和写文件都在线程池中执行
+        digest, file_path, size, written = await file_io.run(_decode_base64_to_file, content, start, cache_dir, ext)
+        key = f"sha256:{digest}"
+        entry = self._index.get(key)
+        if written or not entry:
+            self._stats["misses" if written else "hits"] += 1
+            self._remember(key, file_path, size)
+        else:
+            self._stats["hits"] += 1
+            self._touch(entry)
+        return file_path
+
+    def get_stats(self) -> dict:
+        return dict(self._stats, entries=len(self._index))
 
     def _is_base64(self, s: str) -> bool:
-        try:
-            if isinstance(s, str):
-                s_bytes = bytes(s, 'utf-8')
-            elif isinstance(s, bytes):
-                s_bytes = s
-            else:
+        """只检查长度和首尾字符的廉价判断，不解码整个字符串
+
+        含换行时按行折叠的 base64（MIME/PEM 格式）处理，见 _is_wrapped_base64；
+        空格等其他空白字符说明不是 base64（如带空格的路径或普通文本）。
+        """
+        if isinstance(s, bytes):
+            try:
+                s = s.decode("ascii")
+            except UnicodeDecodeError:
                 return False
-            return base64.b64encode(base64.b64decode(s_bytes)) == s_bytes
-        except Exception:
+        if not isinstance(s, str) or not s:
+            return False
+        if "\n" in s[:BASE64_WRAP_PROBE_CHARS] or "\n" in s[-BASE64_WRAP_PROBE_CHARS:]:
+            return self._is_wrapped_base64(s)
+        if len(s) % 4:
+            return False
+        head = s[:BASE64_PROBE_CHARS]
+        tail = s[-BASE64_PROBE_CHARS:]
+        tail_body = tail.rstrip("=")
+        if len(tail) - len(tail_body) > 2:
+            return False
+        if len(s) <= BASE64_PROBE_CHARS:
+            head = tail_body
+        return bool(_BASE64_BODY.fullmatch(head) and _BASE64_BODY.fullmatch(tail_body))
+
+    def _is_wrapped_base64(self, s: str) -> bool:
+        """按行折叠的 base64：首尾探测片段内的完整行长度相同且为 4 的倍数，最后一行不超过行长
+
+        总长度无法廉价得到，长度校验留给解码（非法字符或长度会让解码失败，cache_media 原样返回）。
+        """
+        whole = len(s) <= BASE64_WRAP_PROBE_CHARS
+        head_lines = _LINE_BREAK.split(s[:BASE64_WRAP_PROBE_CHARS])
+        tail_lines = list(head_lines) if whole else _LINE_BREAK.split(s[-BASE64_WRAP_PROBE_CHARS:])
+        if not whole:
+            # 探测片段两端的行可能被截断
+            head_lines = head_lines[:-1]
+            tail_lines = tail_lines[1:]
+        # 允许以换行结尾
+        if tail_lines and not tail_lines[-1]:
+            tail_lines.pop()
+            if whole:
+                head_lines.pop()
+        if not head_lines or not tail_lines:
+            return False
+        line_len = len(head_lines[0])
+        if not line_len or line_len % 4:
             return False
+        last = tail_lines[-1]
+        last_body = last.rstrip("=")
+        if len(last) - len(last_body) > 2 or not 0 < len(last) <= line_len:
+            return False
+        body_lines = head_lines if not whole else head_lines[:-1]
+        body_lines = body_lines + tail_lines[:-1]
+        if any(len(line) != line_len for line in body_lines):
+            return False
+        return all(_BASE64_BODY.fullmatch(line) for line in body_lines + [last_body])
 
     def _get_extension_from_content_type(self, content_type: str, default_type: str) -> str:
         mime_to_ext = {
@@ -99,3 +312,50 @@ class CacheUtils:
             "text": ".txt"
         }
         return defaults.get(media_type, "")
+
+
+def _decode_base64_to_file(content: str, start: int, cache_dir: str, ext: str):
+    """从 content[start:] 分块解码 base64，边写临时文件边计算哈希（在线程池中调用）
+
+    内存占用只有一个块；完成后按内容哈希改名，同名文件已存在说明内容相同，丢弃临时文件。
+    返回 (内容哈希, 文件路径, 文件大小, 是否新写入)。
+    """
+    hasher = hashlib.sha256()
+    tmp_path = os.path.join(cache_dir, f"base64-{threading.get_ident()}.tmp")
+    size = 0
+    carry = ""
+    try:
+        with open(tmp_path, "wb") as f:
+            for offset in range(start, len(content), BASE64_CHUNK_CHARS):
+                chunk = content[offset:offset + BASE64_CHUNK_CHARS]
+                if "\n" in chunk or "\r" in chunk:
+                    chunk = _LINE_BREAK_CHARS.sub("", chunk)
+                chunk = carry + chunk
+                # 每次只解码 4 的倍数个字符，余下的并入下一块
+                usable = len(chunk) - len(chunk) % 4
+                carry = chunk[usable:]
+                if not usable:
+                    continue
+                decoded = base64.b64decode(chunk[:usable], validate=True)
+                hasher.update(decoded)
+                f.write(decoded)
+                size += len(decoded)
+        if carry:
+            raise ValueError("base64 长度不正确")
+        digest = hasher.hexdigest()
+        file_path = os.path.join(cache_dir, f"{digest}{ext}")
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+            return digest, file_path, size, False
+        os.replace(tmp_path, file_path)
+        return digest, file_path, size, True
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -2,62 +2,41 @@ import json
 import os
 from typing import Dict, List, Any
 
+from .task_store import create_task_store
+from .task_archive import TaskArchive
+
 
 class DataViewer:
     """用于查看和管理本地数据"""
     
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, unified_store=None, task_backend: str = "json"):
         self.data_dir = data_dir  # 数据目录
         self.tasks_file = os.path.join(data_dir, "tasks", "tasks.json")
         self.unified_store_file = os.path.join(data_dir, "unified_store.json")
+        # 传入 UnifiedStore 时直接读取内存数据（journal 模式下快照文件可能不是最新）
+        self.unified_store = unified_store
+        # 任务存储后端，首次查询时创建
+        self.task_backend = task_backend
+        self._task_store = None
+    
+    def _get_task_store(self):
+        if self._task_store is None:
+            self._task_store = create_task_store(os.path.join(self.data_dir, "tasks"), self.task_backend)
+        return self._task_store
+    
+    def _load_unified_origins(self) -> Any:
+        """读取用户映射数据，文件不存在时返回 None"""
+        if self.unified_store is not None:
+            return self.unified_store.all()
+        if not os.path.exists(self.unified_store_file):
+            return None
+        with open(self.unified_store_file, "r", encoding="utf-8") as f:
+            return json.load(f)
     
     def get_tasks_summary(self) -> Dict[str, Any]:
         """获取任务列表摘要"""
         try:
-            if not os.path.exists(self.tasks_file):
-                return {
-                    "total": 0,
-                    "tasks": [],
-                    "status_distribution": {}
-                }
-            
-            with open(self.tasks_file, "r", encoding="utf-8") as f:
-                tasks = json.load(f)
-            
-            if not isinstance(tasks, list):
-                return {
-                    "total": 0,
-                    "tasks": [],
-                    "error": "任务文件格式错误"
-                }
-            
-            # 统计各状态任务数
-            status_dist = {}
-            for task in tasks:
-                status = task.get("status", "unknown")
-                status_dist[status] = status_dist.get(status, 0) + 1
-            
-            # 按类型分类
-            task_types = {}
-            for task in tasks:
-                task_type = task.get("type", "unknown")
-                if task_type not in task_types:
-                    task_types[task_type] = []
-                task_types[task_type].append({
-                    "id": task.get("task_id", "N/A"),
-                    "status": task.get("status", "N/A"),
-                    "type": task_type,
-                    "created_at": task.get("created_at", "N/A"),
-                    "scheduled_time": task.get("scheduled_time", "N/A")
-                })
-            
-            return {
-                "total": len(tasks),
-                "status_distribution": status_dist,
-                "task_types": {k: len(v) for k, v in task_types.items()},
-                "tasks": task_types,
-                "recent_tasks": tasks[-10:] if len(tasks) > 10 else tasks
-            }
+            return self._get_task_store().summary()
         except Exception as e:
             return {
                 "total": 0,
@@ -68,16 +47,14 @@ class DataViewer:
     def get_unified_origins_summary(self) -> Dict[str, Any]:
         """获取用户映射摘要"""
         try:
-            if not os.path.exists(self.unified_store_file):
+            data = self._load_unified_origins()
+            if not data:
                 return {
                     "total": 0,
                     "origins": {},
                     "message": "暂无用户映射数据"
                 }
             
-            with open(self.unified_store_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
             if not isinstance(data, dict):
                 return {
                     "total": 0,
@@ -100,20 +77,20 @@ class DataViewer:
     def get_tasks_details(self, task_id: str = None) -> Dict[str, Any]:
         """获取任务详细信息"""
         try:
-            if not os.path.exists(self.tasks_file):
-                return {"error": "任务文件不存在"}
-            
-            with open(self.tasks_file, "r", encoding="utf-8") as f:
-                tasks = json.load(f)
-            
+            store = self._get_task_store()
             if task_id:
                 # 获取特定任务
-                for task in tasks:
-                    if task.get("task_id") == task_id:
-                        return {"task": task}
+                task = store.get(task_id)
+                if task:
+                    return {"task": task}
+                # 热数据中没有时查询归档
+                task = TaskArchive(os.path.join(self.data_dir, "tasks")).get(task_id)
+                if task:
+                    return {"task": task, "archived": True}
                 return {"error": f"未找到任务: {task_id}"}
             else:
                 # 获取所有任务（分页）
+                tasks = store.load_all()
                 return {
                     "total": len(tasks),
                     "tasks": tasks
@@ -124,12 +101,10 @@ class DataViewer:
     def get_unified_origins_details(self, key: str = None) -> Dict[str, Any]:
         """获取用户映射详细信息"""
         try:
-            if not os.path.exists(self.unified_store_file):
+            data = self._load_unified_origins()
+            if data is None:
                 return {"error": "映射文件不存在"}
             
-            with open(self.unified_store_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
             if key:
                 # 获取特定映射
                 if key in data:
@@ -150,12 +125,7 @@ class DataViewer:
     def export_tasks_as_json(self) -> str:
         """导出任务为JSON字符串"""
         try:
-            if not os.path.exists(self.tasks_file):
-                return json.dumps([])
-            
-            with open(self.tasks_file, "r", encoding="utf-8") as f:
-                tasks = json.load(f)
-            
+            tasks = self._get_task_store().load_all()
             return json.dumps(tasks, ensure_ascii=False, indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
@@ -163,12 +133,10 @@ class DataViewer:
     def export_origins_as_json(self) -> str:
         """导出用户映射为JSON字符串"""
         try:
-            if not os.path.exists(self.unified_store_file):
+            data = self._load_unified_origins()
+            if data is None:
                 return json.dumps({})
             
-            with open(self.unified_store_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
             return json.dumps(data, ensure_ascii=False, indent=2)
         except Exception as e:
             return json.dumps({"error": str(e)})
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+
+class FileIOPool:
+    """插件共享的文件 I/O 线程池：阻塞的读写、解码放到有界线程池执行，不占用事件循环
+
+    在 MyPlugin.initialize 中 start()，terminate 中 close()；未启动时首次使用会按默认参数创建。
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.max_workers = 4
+
+    def start(self, max_workers: int = 4):
+        """按配置创建线程池（已存在时先关闭旧线程池）"""
+        self.close()
+        self.max_workers = max(1, max_workers)
+        self._get_executor()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="niancenter-io")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行 func(*args, **kwargs) 并等待结果"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+
+    async def write_bytes(self, path: str, data: bytes) -> None:
+        await self.run(write_bytes_atomic, path, data)
+
+    def close(self):
+        """等待已提交的写入完成后关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def write_bytes_atomic(path: str, data: bytes) -> None:
+    """先写临时文件再原子替换（在线程池中调用）"""
+    # 同一文件可能被多个线程同时写入，临时文件名按线程区分
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+file_io = FileIOPool()
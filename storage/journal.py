@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class JsonlJournal:
+    """追加写的 JSON Lines 日志文件，每行一条记录"""
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._fp = None
+
+    def _open(self):
+        if self._fp is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fp = open(self.path, "a", encoding="utf-8")
+        return self._fp
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """追加一条记录"""
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """追加多条记录（一次写入）"""
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            fp = self._open()
+            fp.write(data)
+            fp.flush()
+            if self.fsync:
+                os.fsync(fp.fileno())
+
+    def size(self) -> int:
+        """当前日志文件大小（字节）"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def rotate(self, target_path: str) -> bool:
+        """将当前日志文件改名为 target_path，后续写入新文件"""
+        with self._lock:
+            self._close_locked()
+            if not os.path.exists(self.path):
+                return False
+            os.replace(self.path, target_path)
+            return True
+
+    def truncate(self) -> None:
+        """清空日志文件"""
+        with self._lock:
+            self._close_locked()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            finally:
+                self._fp = None
+
+    def replay(self, path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """按写入顺序读取记录，跳过损坏的行（如进程崩溃时写了一半的末行）"""
+        return read_journal(path or self.path)
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """读取 JSON Lines 日志文件"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2) -> None:
+    """先写临时文件再原子替换，避免写到一半时崩溃导致文件损坏"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
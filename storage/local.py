@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from .file_io import file_io
+
 
 class LocalStore:
     def __init__(self, base_dir: str):
@@ -8,14 +10,18 @@ class LocalStore:
         os.makedirs(self.base_dir, exist_ok=True)
 
     async def save_bytes(self, data: bytes, filename: str) -> str:
+        """在文件线程池中写入（先写临时文件再原子替换），不阻塞事件循环"""
         path = Path(self.base_dir) / filename
-        with open(path, "wb") as f:
-            f.write(data)
+        await file_io.write_bytes(str(path), data)
         return str(path)
 
     async def cleanup(self, path: str):
         try:
-            if os.path.exists(path):
-                os.remove(path)
+            await file_io.run(_remove_if_exists, path)
         except Exception:
             pass
+
+
+def _remove_if_exists(path: str):
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .journal import atomic_write_json
+
+
+class TaskArchive:
+    """已结束任务的归档：按天写入 tasks/archive/YYYY-MM-DD.json.gz
+
+    archive/index.json 记录 task_id -> 归档日期，按 id 查询时只需解压一个文件。
+    """
+
+    def __init__(self, tasks_dir: str):
+        self.archive_dir = os.path.join(tasks_dir, "archive")
+        self.index_file = os.path.join(self.archive_dir, "index.json")
+        self._index: Optional[Dict[str, str]] = None
+
+    def _load_index(self) -> Dict[str, str]:
+        if self._index is None:
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except Exception:
+                self._index = {}
+        return self._index
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.archive_dir, f"{day}.json.gz")
+
+    def _read_segment(self, day: str) -> List[Dict[str, Any]]:
+        path = self._segment_path(day)
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            tasks = json.load(f)
+        return tasks if isinstance(tasks, list) else []
+
+    def _write_segment(self, day: str, tasks: List[Dict[str, Any]]):
+        path = self._segment_path(day)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(tasks, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _task_day(task: Dict[str, Any]) -> str:
+        for key in ("updated_at", "created_at"):
+            value = task.get(key)
+            if isinstance(value, str) and len(value) >= 10:
+                return value[:10]
+        return datetime.utcnow().strftime("%Y-%m-%d")
+
+    def archive(self, tasks: Iterable[Dict[str, Any]]) -> int:
+        """把任务追加到对应日期的归档文件，返回归档数量"""
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for task in tasks:
+            if task.get("task_id"):
+                by_day.setdefault(self._task_day(task), []).append(task)
+        if not by_day:
+            return 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        index = self._load_index()
+        count = 0
+        for day, day_tasks in by_day.items():
+            segment = self._read_segment(day)
+            segment.extend(day_tasks)
+            self._write_segment(day, segment)
+            for task in day_tasks:
+                index[str(task["task_id"])] = day
+            count += len(day_tasks)
+        atomic_write_json(self.index_file, index, indent=None)
+        return count
+
+    def contains(self, task_id: str) -> bool:
+        return str(task_id) in self._load_index()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按 id 查询归档任务"""
+        day = self._load_index().get(str(task_id))
+        if not day:
+            return None
+        # 同一任务可能被重复归档，取最后一条
+        for task in reversed(self._read_segment(day)):
+            if str(task.get("task_id")) == str(task_id):
+                return task
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._load_index()
+        return {
+            "archived_total": len(index),
+            "archived_days": len(set(index.values()))
+        }
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from .journal import atomic_write_json
+
+
+class JsonTaskStore:
+    """任务存储：整个任务列表保存为 tasks/tasks.json"""
+
+    backend = "json"
+
+    def __init__(self, tasks_dir: str):
+        self.tasks_dir = tasks_dir
+        self.tasks_file = os.path.join(tasks_dir, "tasks.json")
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """读取全部任务"""
+        if not os.path.exists(self.tasks_file):
+            return []
+        with open(self.tasks_file, "r", encoding="utf-8") as f:
+            tasks = json.load(f)
+        return tasks if isinstance(tasks, list) else []
+
+    def save(self, tasks: List[Dict[str, Any]], changed: Optional[Iterable[Dict[str, Any]]] = None):
+        """保存任务（JSON 文件只能整体重写，忽略 changed）"""
+        atomic_write_json(self.tasks_file, tasks)
+
+    def delete(self, tasks: List[Dict[str, Any]], task_ids: Iterable[str]):
+        """删除任务（tasks 为删除后的完整列表）"""
+        self.save(tasks)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        for task in self.load_all():
+            if task.get("task_id") == task_id:
+                return task
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """任务统计（总数、状态分布、类型分布、最近任务）"""
+        tasks = self.load_all()
+        status_dist = {}
+        task_types = {}
+        for task in tasks:
+            status = task.get("status", "unknown")
+            status_dist[status] = status_dist.get(status, 0) + 1
+            task_type = task.get("type", "unknown")
+            task_types.setdefault(task_type, []).append({
+                "id": task.get("task_id", "N/A"),
+                "status": task.get("status", "N/A"),
+                "type": task_type,
+                "created_at": task.get("created_at", "N/A"),
+                "scheduled_time": task.get("execution_time") or "N/A"
+            })
+        return {
+            "total": len(tasks),
+            "status_distribution": status_dist,
+            "task_types": {k: len(v) for k, v in task_types.items()},
+            "tasks": task_types,
+            "recent_tasks": tasks[-10:]
+        }
+
+    def close(self):
+        pass
+
+
+class SqliteTaskStore:
+    """任务存储：SQLite（WAL 模式），按行增量写入
+
+    task_id 为主键（自带唯一索引），另在 status 和 execution_time 上建立索引。
+    首次创建时会导入已有的 tasks.json，并将其重命名为 tasks.json.migrated。
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, tasks_dir: str):
+        self.tasks_dir = tasks_dir
+        self.db_file = os.path.join(tasks_dir, "tasks.db")
+        self.tasks_file = os.path.join(tasks_dir, "tasks.json")
+        os.makedirs(tasks_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_file)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._migrate_json()
+
+    def _init_schema(self):
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    type TEXT,
+                    status TEXT,
+                    execution_time TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_execution_time ON tasks(execution_time)")
+
+    def _migrate_json(self):
+        """把旧的 tasks.json 导入数据库（仅在数据库为空时）"""
+        if not os.path.exists(self.tasks_file):
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        if count:
+            return
+        tasks = JsonTaskStore(self.tasks_dir).load_all()
+        self.save(tasks)
+        os.replace(self.tasks_file, f"{self.tasks_file}.migrated")
+
+    @staticmethod
+    def _to_row(task: Dict[str, Any]):
+        execution_time = task.get("execution_time")
+        return (
+            str(task.get("task_id")),
+            task.get("type"),
+            task.get("status"),
+            str(execution_time) if execution_time is not None else None,
+            task.get("created_at"),
+            task.get("updated_at"),
+            json.dumps(task, ensure_ascii=False),
+        )
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        rows = self._conn.execute("SELECT data FROM tasks ORDER BY rowid").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save(self, tasks: List[Dict[str, Any]], changed: Optional[Iterable[Dict[str, Any]]] = None):
+        """写入任务；传入 changed 时只写这些任务，否则写入全部"""
+        rows = [self._to_row(t) for t in (tasks if changed is None else changed) if t.get("task_id")]
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO tasks (task_id, type, status, execution_time, created_at, updated_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(task_id) DO UPDATE SET
+                    type = excluded.type,
+                    status = excluded.status,
+                    execution_time = excluded.execution_time,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at,
+                    data = excluded.data
+                """,
+                rows
+            )
+
+    def delete(self, tasks: List[Dict[str, Any]], task_ids: Iterable[str]):
+        with self._conn:
+            self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(str(i),) for i in task_ids])
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT data FROM tasks WHERE task_id = ?", (str(task_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def summary(self) -> Dict[str, Any]:
+        total = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        status_dist = {
+            (status or "unknown"): count
+            for status, count in self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        }
+        task_types = {}
+        for task_id, task_type, status, created_at, execution_time in self._conn.execute(
+            "SELECT task_id, type, status, created_at, execution_time FROM tasks ORDER BY rowid"
+        ):
+            task_type = task_type or "unknown"
+            task_types.setdefault(task_type, []).append({
+                "id": task_id,
+                "status": status or "N/A",
+                "type": task_type,
+                "created_at": created_at or "N/A",
+                "scheduled_time": execution_time or "N/A"
+            })
+        recent = [
+            json.loads(row[0])
+            for row in self._conn.execute("SELECT data FROM tasks ORDER BY rowid DESC LIMIT 10")
+        ]
+        recent.reverse()
+        return {
+            "total": total,
+            "status_distribution": status_dist,
+            "task_types": {k: len(v) for k, v in task_types.items()},
+            "tasks": task_types,
+            "recent_tasks": recent
+        }
+
+    def close(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+
+def create_task_store(tasks_dir: str, backend: str = "json"):
+    """按配置创建任务存储后端（json / sqlite）"""
+    if (backend or "json").lower() == "sqlite":
+        return SqliteTaskStore(tasks_dir)
+    return JsonTaskStore(tasks_dir)
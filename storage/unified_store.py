@@ -1,12 +1,48 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .journal import JsonlJournal, atomic_write_json, read_journal
 
 
 class UnifiedStore:
-    def __init__(self, path: str):
+    """sender -> unified_msg_origin 映射存储
+
+    默认每次写入都整体重写 JSON 文件；开启 journal 模式后，写入只向
+    `<path>.journal` 追加一条记录，读取直接走内存，日志超过阈值时在后台线程
+    中合并为新的快照文件。
+
+    flush_interval > 0 时启用写后缓冲：写入只标记脏键，由后台定时器或 flush()
+    批量落盘；与当前值相同的写入直接跳过。
+    """
+
+    def __init__(self, path: str, journal: bool = False, compact_threshold: int = 1024 * 1024,
+                 flush_interval: float = 0):
         self.path = path
+        self.journal_enabled = journal
+        self.compact_threshold = compact_threshold
+        self.journal_path = f"{path}.journal"
+        # 压缩进行中的日志文件，压缩完成后删除；若进程中途退出，加载时会一并回放
+        self.compacting_path = f"{path}.journal.compacting"
         self._store: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._journal = JsonlJournal(self.journal_path) if journal else None
+        self._compact_thread: Optional[threading.Thread] = None
+        # 写后缓冲：key -> 是否已删除
+        self.flush_interval = flush_interval
+        self._dirty: Dict[str, bool] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "writes": 0,
+            "skipped_writes": 0,
+            "flushes": 0,
+            "flushed_keys": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
         self._load()
 
     def _load(self):
@@ -21,6 +57,34 @@ class UnifiedStore:
                 self._store = {}
         except Exception:
             self._store = {}
+        if not isinstance(self._store, dict):
+            self._store = {}
+
+        # 回放未合并的日志（先回放压缩中的旧日志，再回放当前日志）
+        replayed = False
+        for journal_path in (self.compacting_path, self.journal_path):
+            for record in read_journal(journal_path):
+                self._apply(record)
+                replayed = True
+
+        # 关闭 journal 模式后，把残留日志合并回快照
+        if replayed and not self.journal_enabled:
+            self._save()
+            for journal_path in (self.compacting_path, self.journal_path):
+                try:
+                    os.remove(journal_path)
+                except OSError:
+                    pass
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record.get("op")
+        key = record.get("k")
+        if key is None:
+            return
+        if op == "set":
+            self._store[str(key)] = record.get("v")
+        elif op == "del":
+            self._store.pop(str(key), None)
 
     def _save(self):
         try:
@@ -30,19 +94,150 @@ class UnifiedStore:
         except Exception:
             pass
 
+    def _append(self, record: Dict[str, Any]):
+        self._append_many([record])
+
+    def _append_many(self, records: List[Dict[str, Any]]):
+        try:
+            self._journal.append_many(records)
+        except Exception:
+            # 日志写入失败时退回整体重写，保证数据不丢
+            self._save()
+            return
+        if self._journal.size() >= self.compact_threshold:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        with self._lock:
+            if self._compact_thread and self._compact_thread.is_alive():
+                return
+            try:
+                # 上次压缩未完成时保留旧的 compacting 文件，由本次快照一并覆盖
+                if not os.path.exists(self.compacting_path):
+                    self._journal.rotate(self.compacting_path)
+            except Exception:
+                return
+            snapshot = dict(self._store)
+            self._compact_thread = threading.Thread(
+                target=self._write_snapshot, args=(snapshot,),
+                name="unified-store-compaction", daemon=True
+            )
+            self._compact_thread.start()
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]):
+        try:
+            atomic_write_json(self.path, snapshot)
+            os.remove(self.compacting_path)
+        except Exception:
+            pass
+
+    def compact(self) -> None:
+        """立即合并日志到快照（阻塞直到完成）"""
+        if not self._journal:
+            return
+        self._schedule_compaction()
+        self._wait_compaction()
+
+    def _wait_compaction(self):
+        thread = self._compact_thread
+        if thread and thread.is_alive():
+            thread.join()
+
+    def close(self) -> None:
+        """落盘未写入的数据，等待后台压缩结束并关闭日志文件"""
+        self.flush()
+        if not self._journal:
+            return
+        self._wait_compaction()
+        self._journal.close()
+
+    def start_write_behind(self) -> None:
+        """启动后台定时落盘（需在事件循环中调用）"""
+        if self.flush_interval <= 0 or self._flush_task:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop_write_behind(self) -> None:
+        """停止后台定时落盘并写入剩余数据"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self) -> int:
+        """把脏键写入磁盘，返回写入的键数量"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            self._persist(dirty)
+            return len(dirty)
+
+    def _persist(self, dirty: Dict[str, bool]):
+        start = time.perf_counter()
+        if self._journal:
+            records = []
+            for key, deleted in dirty.items():
+                if deleted:
+                    records.append({"op": "del", "k": key})
+                else:
+                    records.append({"op": "set", "k": key, "v": self._store.get(key)})
+            self._append_many(records)
+        else:
+            self._save()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._stats["flushes"] += 1
+        self._stats["flushed_keys"] += len(dirty)
+        self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+        self._stats["total_flush_ms"] += elapsed_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """写入统计：写入次数、跳过的重复写入、落盘次数与耗时"""
+        stats = dict(self._stats)
+        stats["total_flush_ms"] = round(stats["total_flush_ms"], 3)
+        stats["pending_keys"] = len(self._dirty)
+        stats["write_behind"] = self.flush_interval > 0
+        return stats
+
+    def _write(self, key: str, deleted: bool):
+        self._stats["writes"] += 1
+        if self.flush_interval > 0:
+            self._dirty[key] = deleted
+        else:
+            self._persist({key: deleted})
+
     def get(self, key: str) -> Optional[Any]:
         return self._store.get(key)
 
     def set(self, key: str, value: Any) -> None:
-        self._store[str(key)] = value
-        self._save()
+        key = str(key)
+        with self._lock:
+            if key in self._store and self._store[key] == value:
+                self._stats["skipped_writes"] += 1
+                return
+            self._store[key] = value
+            self._write(key, False)
 
     def delete(self, key: str) -> bool:
-        if str(key) in self._store:
-            del self._store[str(key)]
-            self._save()
-            return True
-        return False
+        key = str(key)
+        with self._lock:
+            if key in self._store:
+                del self._store[key]
+                self._write(key, True)
+                return True
+            return False
 
     def all(self) -> Dict[str, Any]:
         return dict(self._store)
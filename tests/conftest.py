@@ -0,0 +1,66 @@
+import importlib
+import os
+import sys
+import types
+
+# 插件以包的形式加载（模块内使用相对导入），把插件目录的上级目录加入搜索路径
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+
+
+class _StubMessageChain:
+    """未安装 AstrBot 时代替 MessageChain：记录消息段，支持链式调用"""
+
+    def __init__(self):
+        self.chain = []
+
+    def message(self, content):
+        self.chain.append(content)
+        return self
+
+    def file_image(self, path):
+        return self.message(path)
+
+    def file_video(self, path):
+        return self.message(path)
+
+
+def _install_astrbot_stub():
+    """测试只覆盖插件自身逻辑：未安装 AstrBot 时注册最小桩模块，让依赖它的模块可以导入"""
+    try:
+        import astrbot  # noqa: F401
+        return
+    except ImportError:
+        pass
+    component = lambda **kwargs: types.SimpleNamespace(**kwargs)
+    modules = {
+        "astrbot": {},
+        "astrbot.api": {},
+        "astrbot.api.event": {"MessageChain": _StubMessageChain, "AstrMessageEvent": object},
+        "astrbot.api.message_components": {"Record": component, "File": component},
+        "astrbot.core": {},
+        "astrbot.core.message": {},
+        "astrbot.core.message.components": {
+            "Plain": component, "Image": component, "Record": component, "Video": component
+        },
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+
+_install_astrbot_stub()
+
+
+def load(module: str):
+    """按插件内的模块路径导入，如 load("storage.cache_utils")"""
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+class SilentLogger:
+    """与 LoggerManager 接口一致的静默日志"""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+
+from conftest import SilentLogger, load
+
+cache_utils_module = load("storage.cache_utils")
+cache_manager_module = load("storage.cache_manager")
+MB = cache_manager_module.MB
+DAY = 86400
+
+
+def _cache(tmp_path):
+    return cache_utils_module.CacheUtils(str(tmp_path))
+
+
+def _add(cache, media_type, name, size, age, hits=0, url=None):
+    """写入一个缓存文件并登记索引（age 为距上次访问的秒数）"""
+    path = os.path.join(cache.cache_dir, media_type, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    key = cache._hash_key("url", url or f"https://example.invalid/{name}")
+    cache._index[key] = {
+        "path": f"{media_type}/{name}", "size": size,
+        "created_at": time.time() - age, "last_access": time.time() - age, "hits": hits,
+    }
+    return path
+
+
+def _manager(cache, **kwargs):
+    kwargs.setdefault("max_total_mb", 0)
+    kwargs.setdefault("min_age", 0)
+    return cache_manager_module.CacheManager(cache, SilentLogger(), None, **kwargs)
+
+
+def _remaining(cache):
+    return sorted(
+        name for media_type in cache_manager_module.CACHE_TYPES
+        for name in os.listdir(os.path.join(cache.cache_dir, media_type))
+    )
+
+
+def test_type_budget_then_total_budget(tmp_path):
+    cache = _cache(tmp_path)
+    _add(cache, "image", "i1.png", 1000, age=3 * DAY)
+    _add(cache, "image", "i2.png", 1000, age=2 * DAY)
+    _add(cache, "image", "i3.png", 1000, age=1 * DAY)
+    _add(cache, "video", "v1.mp4", 3000, age=4 * DAY)
+    _add(cache, "voice", "a1.wav", 500, age=5 * DAY)
+    manager = _manager(cache, type_max_mb={"image": 2000 / MB}, max_total_mb=5000 / MB)
+
+    result = asyncio.run(manager.sweep())
+    # 图片超出类型上限淘汰最旧的一张；总量仍超限时再按访问时间淘汰最旧的语音
+    assert result == {"evicted_files": 2, "evicted_bytes": 1500}
+    assert _remaining(cache) == ["i2.png", "i3.png", "v1.mp4"]
+    stats = manager.get_stats()
+    assert stats["total_bytes"] == 5000
+    assert stats["bytes_by_type"]["image"] == 2000
+    # 淘汰的文件同时移出索引
+    assert sorted(e["path"] for e in cache.index_entries().values()) == ["image/i2.png", "image/i3.png", "video/v1.mp4"]
+
+
+def test_protected_and_recent_files_are_kept(tmp_path):
+    cache = _cache(tmp_path)
+    _add(cache, "image", "pending.png", 1000, age=9 * DAY, url="https://example.invalid/pending.png")
+    _add(cache, "image", "old.png", 1000, age=5 * DAY)
+    _add(cache, "image", "sending.png", 1000, age=10)
+    manager = _manager(cache, max_total_mb=1000 / MB, min_age=300,
+                       protected_sources=lambda: ["https://example.invalid/pending.png", "/not/a/url"])
+
+    result = asyncio.run(manager.sweep())
+    # 待执行任务引用的文件和最近访问过的文件不淘汰，即使仍超出上限
+    assert result == {"evicted_files": 1, "evicted_bytes": 1000}
+    assert _remaining(cache) == ["pending.png", "sending.png"]
+    assert manager.get_stats()["total_bytes"] == 2000
+
+
+def test_lfu_evicts_least_used_first(tmp_path):
+    cache = _cache(tmp_path)
+    _add(cache, "file", "popular.bin", 1000, age=5 * DAY, hits=9)
+    _add(cache, "file", "rare-old.bin", 1000, age=3 * DAY, hits=1)
+    _add(cache, "file", "rare-new.bin", 1000, age=1 * DAY, hits=1)
+    _add(cache, "file", "fresh.bin", 1000, age=2 * DAY, hits=4)
+    manager = _manager(cache, max_total_mb=2000 / MB, policy="lfu")
+
+    asyncio.run(manager.sweep())
+    # 访问次数相同时先淘汰更久未访问的
+    assert _remaining(cache) == ["fresh.bin", "popular.bin"]
+
+    lru_cache = _cache(tmp_path / "lru")
+    _add(lru_cache, "file", "popular.bin", 1000, age=5 * DAY, hits=9)
+    _add(lru_cache, "file", "recent.bin", 1000, age=1 * DAY, hits=0)
+    asyncio.run(_manager(lru_cache, max_total_mb=1000 / MB).sweep())
+    assert _remaining(lru_cache) == ["recent.bin"]
+
+
+def test_unindexed_files_use_mtime(tmp_path):
+    cache = _cache(tmp_path)
+    stray = os.path.join(cache.cache_dir, "video", "stray.mp4")
+    with open(stray, "wb") as f:
+        f.write(b"x" * 1000)
+    os.utime(stray, (time.time() - 3 * DAY, time.time() - 3 * DAY))
+    _add(cache, "video", "indexed.mp4", 1000, age=1 * DAY)
+    # 写了一半的临时文件不计入也不删除
+    with open(os.path.join(cache.cache_dir, "video", "part.tmp"), "wb") as f:
+        f.write(b"x" * 5000)
+
+    asyncio.run(_manager(cache, max_total_mb=1000 / MB).sweep())
+    assert _remaining(cache) == ["indexed.mp4", "part.tmp"]
@@ -0,0 +1,55 @@
+import asyncio
+import base64
+import hashlib
+import os
+
+from conftest import load
+
+cache_module = load("storage.cache_utils")
+
+
+def test_is_base64_cheap_checks(tmp_path):
+    cache = cache_module.CacheUtils(str(tmp_path))
+    assert cache._is_base64("aGVsbG8=")
+    assert cache._is_base64("QUJD" * 10000)
+    assert not cache._is_base64("aGVsbG8")
+    assert not cache._is_base64("/data/image.png")
+    assert not cache._is_base64("a===")
+    assert not cache._is_base64("")
+    # 空格不是 base64 的折行
+    assert not cache._is_base64("Good morn")
+    assert not cache._is_base64("Good morning")
+    assert not cache._is_base64("/srv/media/my cat")
+    assert not cache._is_base64("/srv/my cat.png")
+    assert not cache._is_base64("aGVs\nbG8=\nIQ==")
+
+
+def test_text_with_spaces_is_not_decoded(tmp_path):
+    cache = cache_module.CacheUtils(str(tmp_path))
+    for source in ("/srv/media/my cat", "Good morn"):
+        assert asyncio.run(cache.cache_media(source, "image")) == source
+
+
+def test_wrapped_base64_is_detected_and_decoded(tmp_path, monkeypatch):
+    # 小块解码，覆盖跨块的换行和补位
+    monkeypatch.setattr(cache_module, "BASE64_CHUNK_CHARS", 1000)
+    cache = cache_module.CacheUtils(str(tmp_path))
+    data = os.urandom(5000)
+    wrapped = base64.encodebytes(data).decode()
+    assert "\n" in wrapped
+    assert cache._is_base64(wrapped)
+    assert cache._is_base64("\r\n".join(wrapped.splitlines()))
+    assert cache._is_base64(base64.encodebytes(b"hi").decode())
+    pem = "\n".join(base64.b64encode(data).decode()[i:i + 64] for i in range(0, 6668, 64))
+    assert cache._is_base64(pem)
+    # 行长不一致
+    assert not cache._is_base64(wrapped.replace("\n", "", 1))
+
+    path = asyncio.run(cache.cache_media(wrapped, "image"))
+    assert path != wrapped
+    assert os.path.basename(path).startswith(hashlib.sha256(data).hexdigest())
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+    # 同一内容的不同写法复用同一个缓存文件
+    assert asyncio.run(cache.cache_media(base64.b64encode(data).decode(), "image")) == path
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from conftest import SilentLogger, load
+
+outbox_module = load("scheduler.status_outbox")
+
+
+def _batch():
+    return [
+        {"task_id": 1, "status": "success", "result": None},
+        {"task_id": "2", "status": "failed", "result": {"error": "x"}},
+    ]
+
+
+def _send_bulk(monkeypatch, response, bulk_mode="auto"):
+    async def fake_fetch(url, method="GET", params=None, headers=None, timeout=10):
+        return response
+
+    monkeypatch.setattr(outbox_module, "fetch_json", fake_fetch)
+    outbox = outbox_module.StatusUpdateOutbox("http://task-center.invalid", "token", SilentLogger(),
+                                              bulk_mode=bulk_mode)
+    return outbox, asyncio.run(outbox._send_bulk(_batch(), {"Authorization": "token"}))
+
+
+def test_generic_success_is_not_bulk_support(monkeypatch):
+    outbox, failed = _send_bulk(monkeypatch, {"success": True})
+    # 无法确认批量更新生效：本批改为逐个发送，之后不再尝试批量接口
+    assert failed is None
+    assert outbox._bulk_supported is False
+
+
+def test_explicit_contract_reports_failed_ids(monkeypatch):
+    outbox, failed = _send_bulk(monkeypatch, {"success": True, "updated": 1, "failed": ["1"]})
+    assert outbox._bulk_supported is True
+    assert [update["task_id"] for update in failed] == [1]
+
+
+@pytest.mark.parametrize("status, body", [
+    (503, "Service Unavailable"),
+    (500, {"success": False, "error": "db down"}),
+    (200, {"success": False, "error": "unknown task"}),
+])
+def test_single_update_failures_are_retried(monkeypatch, tmp_path, status, body):
+    async def fake_fetch_meta(url, method="GET", params=None, headers=None, timeout=10):
+        return status, {}, body
+
+    monkeypatch.setattr(outbox_module, "fetch_json_with_meta", fake_fetch_meta)
+    outbox = outbox_module.StatusUpdateOutbox("http://task-center.invalid", "token", SilentLogger(),
+                                              bulk_mode="off", state_file=str(tmp_path / "outbox.json"))
+    outbox.enqueue("t1", "success", {"sent": True})
+    asyncio.run(outbox.flush())
+    assert outbox.get_stats()["retry_depth"] == 1
+
+
+def test_single_update_success(monkeypatch, tmp_path):
+    async def fake_fetch_meta(url, method="GET", params=None, headers=None, timeout=10):
+        return 200, {}, {"success": True}
+
+    monkeypatch.setattr(outbox_module, "fetch_json_with_meta", fake_fetch_meta)
+    outbox = outbox_module.StatusUpdateOutbox("http://task-center.invalid", "token", SilentLogger(),
+                                              bulk_mode="off", state_file=str(tmp_path / "outbox.json"))
+    outbox.enqueue("t1", "success", {"sent": True})
+    asyncio.run(outbox.flush())
+    assert outbox.get_stats()["retry_depth"] == 0
+
+
+def test_replacing_retried_update_is_persisted(monkeypatch, tmp_path):
+    sent = []
+
+    async def fake_fetch_meta(url, method="GET", params=None, headers=None, timeout=10):
+        sent.append((params["task_id"], params["status"]))
+        return 200, {}, {"success": True}
+
+    monkeypatch.setattr(outbox_module, "fetch_json_with_meta", fake_fetch_meta)
+    state_file = str(tmp_path / "outbox.json")
+    make = lambda: outbox_module.StatusUpdateOutbox("http://task-center.invalid", "token", SilentLogger(),
+                                                    bulk_mode="off", state_file=state_file)
+    outbox = make()
+    outbox._schedule_retry({"task_id": "t1", "status": "running"})
+    outbox._save_retry_queue()
+
+    outbox.enqueue("t1", "success", {"sent": True})
+    # 新状态在发送前已写入状态文件，重启后仍会发送
+    restored = make()._retry["t1"]
+    assert (restored["status"], restored["result"]) == ("success", {"sent": True})
+
+    asyncio.run(outbox.flush())
+    assert sent == [("t1", "success")]
+    assert outbox.get_stats()["retry_depth"] == 0
+    assert make()._retry == {}
@@ -0,0 +1,195 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from conftest import SilentLogger, load
+
+
+class BlockingExecutor:
+    """local_storage 任务一直阻塞，active_message 任务立即完成"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sent = []
+
+    async def execute_local_storage(self, task):
+        await self.release.wait()
+
+    async def execute_active_message(self, task):
+        self.sent.append(task["task_id"])
+
+
+def test_saturated_type_does_not_block_other_types():
+    TaskManager = load("core.task_manager").TaskManager
+
+    async def scenario():
+        executor = BlockingExecutor()
+        manager = SimpleNamespace(
+            logger=SilentLogger(),
+            executor=executor,
+            _execution_semaphore=asyncio.Semaphore(2),
+            _type_semaphores={
+                "local_storage": asyncio.Semaphore(1),
+                "active_message": asyncio.Semaphore(1),
+            },
+        )
+        run = lambda task: TaskManager._run_task(manager, task)
+        # 3 个 local_storage 任务：1 个执行中，2 个在类型信号量上排队
+        storage = [asyncio.create_task(run({"task_id": f"s{i}", "type": "local_storage"})) for i in range(3)]
+        await asyncio.sleep(0)
+        message = asyncio.create_task(run({"task_id": "m0", "type": "active_message"}))
+        assert await asyncio.wait_for(message, timeout=1) is True
+        assert executor.sent == ["m0"]
+        executor.release.set()
+        assert all(await asyncio.gather(*storage))
+
+    asyncio.run(scenario())
+
+
+def test_slow_task_does_not_block_later_due_tasks(tmp_path):
+    TaskManager = load("core.task_manager").TaskManager
+
+    async def scenario():
+        manager = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+        executor = BlockingExecutor()
+        manager.executor = executor
+        now = time.time()
+        slow = {"task_id": "s0", "type": "local_storage", "status": "pending"}
+        manager._due.append((now, slow))
+        await asyncio.wait_for(manager._execute_pending_tasks(), timeout=1)
+        assert set(manager._running) == {"s0"}
+
+        # 慢任务仍在执行时，新到期的任务照常派发执行
+        manager._due.extend([(now, {"task_id": "m0", "type": "active_message", "status": "pending"}), (now, slow)])
+        await manager._execute_pending_tasks()
+        await asyncio.sleep(0.01)
+        assert executor.sent == ["m0"]
+        assert set(manager._running) == {"s0"}
+
+        executor.release.set()
+        await asyncio.wait_for(asyncio.gather(*manager._running.values()), timeout=1)
+        assert manager._running == {}
+        manager.close()
+
+    asyncio.run(scenario())
+
+
+class HangingExecutor:
+    """任务标记为执行中后一直不返回"""
+
+    async def execute_local_storage(self, task):
+        task["status"] = "running"
+        await asyncio.Event().wait()
+
+
+class RecordingOutbox:
+    def __init__(self):
+        self.updates = []
+
+    def enqueue(self, task_id, status, result=None):
+        self.updates.append((task_id, status))
+
+    async def stop(self):
+        pass
+
+
+def test_stop_polling_requeues_interrupted_tasks(tmp_path):
+    TaskManager = load("core.task_manager").TaskManager
+
+    async def scenario():
+        manager = TaskManager(str(tmp_path), {"task_shutdown_timeout": 0.05}, SilentLogger(), None)
+        manager.executor = HangingExecutor()
+        manager.status_outbox = RecordingOutbox()
+        task = {"task_id": "s0", "type": "local_storage", "status": "pending"}
+        manager.tasks.append(task)
+        manager._task_index["s0"] = task
+        manager._due.append((time.time(), task))
+        await manager._execute_pending_tasks()
+        await asyncio.sleep(0.01)
+        assert task["status"] == "running"
+
+        await asyncio.wait_for(manager.stop_polling(), timeout=1)
+        assert manager._running == {}
+        assert task["status"] == "pending"
+        assert manager.status_outbox.updates == [("s0", "pending")]
+        manager.close()
+
+    asyncio.run(scenario())
+    reloaded = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+    assert reloaded._task_index["s0"]["status"] == "pending"
+    reloaded.close()
+
+
+def test_stale_running_tasks_are_requeued_on_load(tmp_path):
+    TaskManager = load("core.task_manager").TaskManager
+    manager = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+    task = {"task_id": "s0", "type": "local_storage", "status": "running"}
+    manager.tasks.append(task)
+    manager.store.save(manager.tasks, [task])
+    manager.close()
+
+    reloaded = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+    assert reloaded._task_index["s0"]["status"] == "pending"
+    reloaded.close()
+    again = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+    assert again._task_index["s0"]["status"] == "pending"
+    again.close()
+
+
+class CountingJournal:
+    def __init__(self, journal):
+        self.journal = journal
+        self.appends = []
+
+    def append_many(self, records):
+        self.appends.append(len(records))
+        self.journal.append_many(records)
+
+    def __getattr__(self, name):
+        return getattr(self.journal, name)
+
+
+def test_intent_log_group_commits_off_loop(tmp_path):
+    TaskManager = load("core.task_manager").TaskManager
+
+    async def scenario():
+        manager = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+        manager._intent_log = CountingJournal(manager._intent_log)
+        tasks = [{"task_id": f"t{i}", "type": "active_message", "status": "pending"} for i in range(50)]
+        for task in tasks:
+            manager._mark_dirty([task])
+        await manager._drain_intents()
+        # 同一轮事件循环中的 50 次变化合并为一次追加
+        assert manager._intent_log.appends == [50]
+        replayed = [r["task"]["task_id"] for r in manager._intent_log.replay()]
+        assert replayed == [t["task_id"] for t in tasks]
+
+        # 落盘后日志被清空，之后的变化重新写入
+        manager._flush_tasks()
+        manager._mark_dirty([dict(tasks[0], status="success")])
+        await manager._drain_intents()
+        assert [r["task"]["status"] for r in manager._intent_log.replay()] == ["success"]
+        manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_flush_during_intent_write_keeps_order(tmp_path):
+    TaskManager = load("core.task_manager").TaskManager
+
+    async def scenario():
+        manager = TaskManager(str(tmp_path), {}, SilentLogger(), None)
+        task = {"task_id": "t1", "type": "active_message", "status": "pending"}
+        manager._mark_dirty([dict(task, status="running")])
+        # 写入尚未完成时落盘：旧记录不能在清空日志之后才写入
+        manager._flush_tasks()
+        manager._mark_dirty([dict(task, status="success")])
+        await manager._drain_intents()
+        assert [r["task"]["status"] for r in manager._intent_log.replay()] == ["success"]
+        manager.close()
+
+    asyncio.run(scenario())
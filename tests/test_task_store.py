@@ -0,0 +1,77 @@
+import os
+import sqlite3
+
+from conftest import load
+
+task_store = load("storage.task_store")
+
+
+def _tasks():
+    return [
+        {"task_id": "t1", "type": "active_message", "status": "pending",
+         "execution_time": "2026-01-01 08:00:00", "content": {"message": "早上好"}},
+        {"task_id": 2, "type": "local_storage", "status": "success", "execution_time": 1767225600},
+    ]
+
+
+def test_sqlite_round_trip(tmp_path):
+    store = task_store.create_task_store(str(tmp_path), "sqlite")
+    assert isinstance(store, task_store.SqliteTaskStore)
+    tasks = _tasks()
+    store.save(tasks)
+    store.close()
+
+    reopened = task_store.SqliteTaskStore(str(tmp_path))
+    # 按插入顺序返回完整的任务数据（包括非字符串 id 和嵌套字段）
+    assert reopened.load_all() == tasks
+    assert reopened.get("2") == tasks[1]
+    assert reopened.get("missing") is None
+    reopened.close()
+
+
+def test_sqlite_save_changed_only_writes_changed_rows(tmp_path):
+    store = task_store.SqliteTaskStore(str(tmp_path))
+    tasks = _tasks()
+    store.save(tasks)
+
+    tasks[0]["status"] = "success"
+    # 未传入 changed 的修改不会写入
+    tasks[1]["status"] = "failed"
+    added = {"task_id": "t3", "type": "active_message", "status": "pending"}
+    tasks.append(added)
+    store.save(tasks, [tasks[0], added])
+
+    loaded = {t["task_id"]: t for t in store.load_all()}
+    assert [loaded[k]["status"] for k in ("t1", 2, "t3")] == ["success", "success", "pending"]
+    # 索引列随数据一起更新
+    with sqlite3.connect(store.db_file) as conn:
+        assert conn.execute("SELECT status FROM tasks WHERE task_id = 't1'").fetchone() == ("success",)
+
+    store.delete(tasks, ["t1"])
+    assert [t["task_id"] for t in store.load_all()] == [2, "t3"]
+    store.close()
+
+
+def test_sqlite_migrates_existing_json(tmp_path):
+    tasks = _tasks()
+    task_store.JsonTaskStore(str(tmp_path)).save(tasks)
+
+    store = task_store.SqliteTaskStore(str(tmp_path))
+    assert store.load_all() == tasks
+    assert not os.path.exists(store.tasks_file)
+    assert os.path.exists(f"{store.tasks_file}.migrated")
+    store.close()
+
+
+def test_summary_matches_across_backends(tmp_path):
+    summaries = []
+    for backend in ("json", "sqlite"):
+        store = task_store.create_task_store(str(tmp_path / backend), backend)
+        store.save(_tasks())
+        summaries.append(store.summary())
+        store.close()
+    json_summary, sqlite_summary = summaries
+    assert json_summary["tasks"]["active_message"][0]["scheduled_time"] == "2026-01-01 08:00:00"
+    assert json_summary["status_distribution"] == sqlite_summary["status_distribution"]
+    assert json_summary["task_types"] == sqlite_summary["task_types"]
+    assert json_summary["tasks"]["active_message"] == sqlite_summary["tasks"]["active_message"]
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from conftest import SilentLogger, load
+
+sync_module = load("scheduler.task_sync_manager")
+
+
+def _make_manager(tmp_path, state=None):
+    manager = sync_module.TaskSyncManager(
+        "http://task-center.invalid/api/tasks", "token", SilentLogger(), [], lambda changed: None,
+        state_file=str(tmp_path / "sync_state.json"), bulk_mode="off", page_size=2
+    )
+    if state:
+        manager._sync_state.update(state)
+    return manager
+
+
+def test_rejected_resume_cursor_is_dropped(tmp_path, monkeypatch):
+    requests = []
+
+    async def fake_fetch(url, method="GET", params=None, headers=None, timeout=10):
+        requests.append(dict(params))
+        if params.get("cursor"):
+            return 400, {}, {"success": False, "error": "invalid cursor"}
+        return 200, {}, {"success": True, "data": [], "has_more": False}
+
+    monkeypatch.setattr(sync_module, "fetch_json_with_meta", fake_fetch)
+    manager = _make_manager(tmp_path, {"cursor": "expired"})
+
+    assert asyncio.run(manager.sync_tasks()) is None
+    assert "cursor" not in manager.get_sync_state()
+    assert "cursor" not in _make_manager(tmp_path).get_sync_state()
+
+    # 下一次同步从第一页开始，不再携带过期游标
+    assert asyncio.run(manager.sync_tasks()) == 0
+    assert requests[-1].get("page") == 1 and "cursor" not in requests[-1]
+
+
+def test_not_modified_still_retries_failed_marks(tmp_path, monkeypatch):
+    marked = []
+
+    async def fake_fetch_meta(url, method="GET", params=None, headers=None, timeout=10):
+        if params.get("type") == "update":
+            marked.append(params.get("task_id"))
+            return 200, {}, {"success": True}
+        return 304, {}, None
+
+    monkeypatch.setattr(sync_module, "fetch_json_with_meta", fake_fetch_meta)
+    manager = _make_manager(tmp_path)
+    record = {"task_id": "t1", "synced": False, "sync_failures": 1}
+    manager.tasks.append(record)
+    manager.task_index["t1"] = record
+    manager._unsynced_ids.add("t1")
+
+    assert asyncio.run(manager.sync_tasks()) == 0
+    assert marked == ["t1"]
+    assert record["synced"] is True
+
+
+@pytest.mark.parametrize("status, body", [(500, "Internal Server Error"), (200, {"success": False})])
+def test_failed_single_mark_is_retried(tmp_path, monkeypatch, status, body):
+    async def fake_fetch(url, method="GET", params=None, headers=None, timeout=10):
+        return status, {}, body
+
+    monkeypatch.setattr(sync_module, "fetch_json_with_meta", fake_fetch)
+    manager = _make_manager(tmp_path)
+    record = {"task_id": "t1", "synced": False}
+    manager.tasks.append(record)
+    manager.task_index["t1"] = record
+
+    changed = asyncio.run(manager._mark_records_synced({"t1": record}, {"Authorization": "token"}))
+    assert changed == [record]
+    assert record["synced"] is False and record["sync_failures"] == 1
+    assert "t1" in manager._unsynced_ids
+
+
+def _mark_bulk(tmp_path, monkeypatch, response):
+    async def fake_fetch(url, method="GET", params=None, headers=None, timeout=10):
+        return response
+
+    monkeypatch.setattr(sync_module, "fetch_json", fake_fetch)
+    manager = _make_manager(tmp_path)
+    manager.bulk_mode, manager._bulk_supported = "auto", None
+    return manager, asyncio.run(manager._mark_tasks_synced_bulk([1, "2", 3], {"Authorization": "token"}))
+
+
+def test_bulk_mark_requires_explicit_contract(tmp_path, monkeypatch):
+    manager, succeeded = _mark_bulk(tmp_path, monkeypatch, {"success": True})
+    assert succeeded is None
+    assert manager._bulk_supported is False
+
+
+def test_bulk_mark_failed_ids_match_regardless_of_type(tmp_path, monkeypatch):
+    manager, succeeded = _mark_bulk(tmp_path, monkeypatch, {"updated": 1, "failed": ["1", 3]})
+    assert succeeded == {"2"}
+    assert manager._bulk_supported is True
+
+
+def test_archived_tasks_are_not_re_added(tmp_path, monkeypatch):
+    marked = []
+
+    async def fake_fetch(url, method="GET", params=None, headers=None, timeout=10):
+        marked.append(params.get("task_id"))
+        return 200, {}, {"success": True}
+
+    monkeypatch.setattr(sync_module, "fetch_json_with_meta", fake_fetch)
+    archive = load("storage.task_archive").TaskArchive(str(tmp_path))
+    archive.archive([{"task_id": "done", "status": "success", "updated_at": "2026-01-01T00:00:00Z"}])
+    manager = _make_manager(tmp_path)
+    manager.archive = archive
+    remote = {"task_id": "done", "task_type": "active_message", "content": {}, "status": "pending"}
+
+    result = asyncio.run(manager.ingest_pushed_tasks([remote]))
+    assert result == {"accepted": 0, "duplicates": 1}
+    assert manager.tasks == [] and "done" not in manager.task_index
+    # 仍向任务中心确认同步，避免再次投递
+    assert marked == ["done"]
+
+    new_count, all_marked = asyncio.run(manager._sync_page([remote], {"Authorization": "token"}))
+    assert new_count == 0 and all_marked
+    assert manager.tasks == []
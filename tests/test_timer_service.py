@@ -0,0 +1,88 @@
+import random
+
+from conftest import SilentLogger, load
+
+timer_module = load("scheduler.timer_service")
+TICK, WHEEL_SIZE = timer_module.TICK, timer_module.WHEEL_SIZE
+
+
+def _service(base_tick):
+    service = timer_module.TimerService(SilentLogger())
+    # 用合成的格号推进时间轮，不依赖真实时间
+    service._tick = base_tick
+    return service
+
+
+def _register(service, base_tick, deltas):
+    return [service.call_at((base_tick + delta) * TICK, lambda: None) for delta in deltas]
+
+
+def test_timers_cascade_down_through_all_levels():
+    base = 12345 * WHEEL_SIZE + 17
+    service = _service(base)
+    # 分别落在第 0~3 层和溢出列表
+    deltas = [5, WHEEL_SIZE + 3, WHEEL_SIZE ** 2 + 7, WHEEL_SIZE ** 3 + 11, WHEEL_SIZE ** 4 + 2]
+    handles = _register(service, base, deltas)
+    assert service._overflow == [handles[-1]]
+    assert service._next_expire() == handles[0].expire
+
+    for handle in handles:
+        # 到期前一格不触发，到期格恰好触发这一个
+        assert service._advance(handle.expire - 1) == []
+        assert service._advance(handle.expire) == [handle]
+    assert service._next_expire() is None
+
+
+def test_random_timers_fire_once_at_first_tick_past_expire():
+    rng = random.Random(20260101)
+    base = rng.randrange(1 << 30)
+    service = _service(base)
+    handles = _register(service, base, [rng.randrange(WHEEL_SIZE ** 3 * 2) for _ in range(500)])
+    cancelled = set(rng.sample(range(len(handles)), 50))
+    for i in cancelled:
+        handles[i].cancel()
+
+    fired = {}
+    target = base
+    while service._next_expire() is not None:
+        previous = target
+        target += rng.choice([1, 7, WHEEL_SIZE, WHEEL_SIZE * 5 + 3, WHEEL_SIZE ** 2])
+        for handle in service._advance(target):
+            assert id(handle) not in fired
+            fired[id(handle)] = (previous, target)
+    for i, handle in enumerate(handles):
+        if i in cancelled:
+            assert id(handle) not in fired
+        else:
+            previous, target = fired[id(handle)]
+            assert previous < handle.expire <= target
+    assert len(fired) == len(handles) - len(cancelled)
+
+
+def test_late_ticks_fire_everything_overdue():
+    base = 1000 * WHEEL_SIZE
+    service = _service(base)
+    handles = _register(service, base, [1, 30, WHEEL_SIZE + 1, WHEEL_SIZE * 3])
+    # 驱动循环晚醒（事件循环被阻塞）：一次推进跨过多个到期时间，全部一起触发
+    late = base + WHEEL_SIZE * 2
+    assert sorted(h.expire for h in service._advance(late)) == sorted(h.expire for h in handles[:3])
+
+    # 到期时间已过的新定时器放入就绪列表，下一次推进立即触发
+    past = service.call_at((base + 10) * TICK, lambda: None)
+    assert service._next_expire() == service._tick
+    assert service._advance(late) == [past]
+    assert service._advance(handles[3].expire) == [handles[3]]
+
+
+def test_fire_counts_and_cancel():
+    service = _service(5000)
+    calls = []
+    handle = service.call_at(5001 * TICK, calls.append, "ok")
+    dropped = service.call_at(5001 * TICK, calls.append, "cancelled")
+    dropped.cancel()
+    assert service.get_stats()["timers"] == 1
+    for due in service._advance(5001):
+        service._fire(due)
+    assert calls == ["ok"] and handle.cancelled
+    assert service.get_stats()["timers"] == 0
+    assert service.get_stats()["fired"] == 1
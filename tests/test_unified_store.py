@@ -0,0 +1,70 @@
+import json
+import os
+
+from conftest import load
+
+UnifiedStore = load("storage.unified_store").UnifiedStore
+
+
+def _read_snapshot(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_journal_replay_restores_writes(tmp_path):
+    path = str(tmp_path / "umo.json")
+    store = UnifiedStore(path, journal=True)
+    store.set("alice", "umo:a")
+    store.set("bob", "umo:b")
+    store.set("alice", "umo:a2")
+    store.delete("bob")
+    store.close()
+    # 写入只追加日志，不重写快照
+    assert not os.path.exists(path)
+    assert os.path.exists(store.journal_path)
+
+    assert UnifiedStore(path, journal=True).all() == {"alice": "umo:a2"}
+
+    # 关闭 journal 模式后，残留日志合并回快照
+    plain = UnifiedStore(path)
+    assert plain.all() == {"alice": "umo:a2"}
+    assert _read_snapshot(path) == {"alice": "umo:a2"}
+    assert not os.path.exists(store.journal_path)
+
+
+def test_compaction_rotates_journal_into_snapshot(tmp_path):
+    path = str(tmp_path / "umo.json")
+    store = UnifiedStore(path, journal=True, compact_threshold=1)
+    store.set("alice", "umo:a")
+    store._wait_compaction()
+    assert _read_snapshot(path) == {"alice": "umo:a"}
+    assert not os.path.exists(store.compacting_path)
+
+    # 压缩后的写入进入新的日志，回放时叠加在快照之上
+    store.compact_threshold = 1024 * 1024
+    store.set("bob", "umo:b")
+    store.close()
+    assert _read_snapshot(path) == {"alice": "umo:a"}
+    assert UnifiedStore(path, journal=True).all() == {"alice": "umo:a", "bob": "umo:b"}
+
+
+def test_interrupted_compaction_is_replayed_before_journal(tmp_path):
+    path = str(tmp_path / "umo.json")
+    store = UnifiedStore(path, journal=True)
+    # 模拟压缩中途退出：旧日志已改名但快照未写入
+    with open(store.compacting_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "set", "k": "alice", "v": "old"}) + "\n")
+        f.write(json.dumps({"op": "set", "k": "bob", "v": "umo:b"}) + "\n")
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "set", "k": "alice", "v": "new"}) + "\n")
+        f.write('{"op": "set", "k": "carol"')  # 写了一半的末行
+
+    reloaded = UnifiedStore(path, journal=True)
+    assert reloaded.all() == {"alice": "new", "bob": "umo:b"}
+
+    # 再次压缩时覆盖残留的 compacting 文件
+    reloaded.compact()
+    reloaded.close()
+    assert _read_snapshot(path) == {"alice": "new", "bob": "umo:b"}
+    assert not os.path.exists(reloaded.compacting_path)
+    assert UnifiedStore(path, journal=True).all() == {"alice": "new", "bob": "umo:b"}
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from conftest import SilentLogger, load
+
+
+def _server(authorization="secret"):
+    return load("api.webhook_server").TaskWebhookServer(None, authorization, SilentLogger())
+
+
+def _request(token):
+    return SimpleNamespace(headers={"Authorization": token} if token is not None else {})
+
+
+def test_authorization_checks():
+    server = _server()
+    assert server._authorized(_request("secret"))
+    assert not server._authorized(_request("wrong"))
+    assert not server._authorized(_request(None))
+    assert not _server("")._authorized(_request(""))
+
+
+def test_non_ascii_token_is_rejected_not_raised():
+    server = _server()
+    assert not server._authorized(_request("密钥"))
+    assert _server("密钥")._authorized(_request("密钥"))
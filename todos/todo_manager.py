@@ -4,12 +4,26 @@ import re
 import uuid
 import shutil
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 class TodoManager:
     """待办管理器"""
     
+    # 待办保存后的回调 callback(user_id, todos_data)；插件中有多个实例，因此在类上共享
+    _change_listeners: List[Callable[[str, Dict], None]] = []
+    
+    @classmethod
+    def add_change_listener(cls, callback: Callable[[str, Dict], None]):
+        """注册待办变化回调（如到期提醒据此重新注册定时器）"""
+        if callback not in cls._change_listeners:
+            cls._change_listeners.append(callback)
+    
+    @classmethod
+    def remove_change_listener(cls, callback: Callable[[str, Dict], None]):
+        if callback in cls._change_listeners:
+            cls._change_listeners.remove(callback)
+    
     def __init__(self, user_data_dir: str, logger):
         """
         初始化待办管理器
@@ -52,10 +66,15 @@ class TodoManager:
             todos_file = self._get_todos_file(user_id)
             with open(todos_file, "w", encoding="utf-8") as f:
                 json.dump(todos_data, f, ensure_ascii=False, indent=2)
-            return True
         except Exception as e:
             self.logger.error(f"保存待办文件失败: {e}")
             return False
+        for callback in list(self._change_listeners):
+            try:
+                callback(user_id, todos_data)
+            except Exception as e:
+                self.logger.error(f"待办变化回调失败: {e}")
+        return True
     
     def _generate_todo_id(self) -> str:
         """生成唯一的待办ID"""
@@ -249,7 +268,9 @@ class TodoManager:
                 "content": content,
                 "status": "进行中",
                 "created_at": now.isoformat() + "Z",
-                "estimated_finish_time": estimated_time.isoformat() + "Z",
+                # 本地时间带时区偏移保存，并缓存 epoch 秒供提醒调度直接比较
+                "estimated_finish_time": estimated_time.astimezone().isoformat(),
+                "estimated_finish_time_ts": estimated_time.timestamp(),
                 "finished_at": None,
                 "reminded_at": [],
                 "follow_ups": []